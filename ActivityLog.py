@@ -0,0 +1,278 @@
+import os
+import numpy as np
+
+# Activity codes stored in the activity column.
+MOVE = 0
+TRADE = 1
+
+ACTIVITY_NAMES = ["move", "trade"]
+
+# Column names and their types.
+COLUMNS = {
+    "time": np.int64,
+    "agent": np.int64,
+    "activity": np.int8,
+    "old_x": np.int32,
+    "old_y": np.int32,
+    "new_x": np.int32,
+    "new_y": np.int32,
+    "other": np.int64,
+    "wealth": np.float64,
+    "other_wealth": np.float64,
+}
+
+# The columns of a move and of a trade, after time and agent, in the order they are buffered.
+MOVE_COLUMNS = ["old_x", "old_y", "new_x", "new_y"]
+
+TRADE_COLUMNS = ["other", "wealth", "other_wealth"]
+
+# Values stored in the columns an activity does not use.
+EMPTY = {
+    "old_x": -1,
+    "old_y": -1,
+    "new_x": -1,
+    "new_y": -1,
+    "other": -1,
+    "wealth": np.nan,
+    "other_wealth": np.nan,
+}
+
+
+class ActivityLog:
+
+    """An append-only, columnar log of the agents' activities.
+
+    Every column is a preallocated NumPy buffer, filled with its empty value,
+    that doubles when it runs out. When a directory is given the columns are
+    memory-mapped files in it, so a long run can spill to disk instead of
+    holding the whole log in memory.
+
+    Moves and trades are buffered as tuples and written into their own
+    columns in one go by commit(), which the model calls once per step and
+    every read calls first.
+    """
+
+    def __init__(self, chunk_size=65536, path=None):
+
+        self.chunk_size = chunk_size
+
+        self.path = path
+
+        self.size = 0
+
+        self.capacity = 0
+
+        self.columns = {}
+
+        # The buffered moves and trades, each a tuple of its row and its values.
+        self.pending_moves = []
+
+        self.pending_trades = []
+
+        # The history of every agent asked for, so each one only scans the rows added since it last looked.
+        self.histories = {}
+
+        if path is not None:
+
+            os.makedirs(path, exist_ok=True)
+
+        self.grow()
+
+    def grow(self, minimum=0):
+
+        """Double the capacity of every column, starting from chunk_size, to at least minimum rows."""
+
+        capacity = max(2 * self.capacity, self.chunk_size, minimum)
+
+        for name, dtype in COLUMNS.items():
+
+            if self.path is None:
+
+                column = np.empty(capacity, dtype=dtype)
+
+                if self.capacity:
+
+                    column[:self.capacity] = self.columns[name]
+
+            else:
+
+                # Extend the file and map it again; the logged rows stay on disk.
+                filename = os.path.join(self.path, name + ".dat")
+
+                if name in self.columns:
+
+                    self.columns[name].flush()
+
+                with open(filename, "ab") as file:
+
+                    file.truncate(capacity * np.dtype(dtype).itemsize)
+
+                column = np.memmap(filename, dtype=dtype, mode="r+", shape=(capacity,))
+
+            # Rows only get the columns of their activity written, so the rest must already be empty.
+            if name in EMPTY:
+
+                column[self.capacity:] = EMPTY[name]
+
+            self.columns[name] = column
+
+        self.capacity = capacity
+
+    def append(self, time, agent, activity, **values):
+
+        """Append one row. Columns that are not given are left empty."""
+
+        row = self.reserve()
+
+        self.columns["time"][row] = time
+
+        self.columns["agent"][row] = agent
+
+        self.columns["activity"][row] = activity
+
+        for name, value in values.items():
+
+            self.columns[name][row] = value
+
+    def reserve(self):
+
+        """Return the next row, growing the columns if they are full."""
+
+        if self.size == self.capacity:
+
+            self.grow()
+
+        self.size += 1
+
+        return self.size - 1
+
+    def append_move(self, time, agent, old_pos, new_pos):
+
+        self.pending_moves.append((self.reserve(), time, agent, old_pos[0], old_pos[1], new_pos[0], new_pos[1]))
+
+    def append_trade(self, time, agent, other, wealth, other_wealth):
+
+        self.pending_trades.append((self.reserve(), time, agent, other, wealth, other_wealth))
+
+    def commit(self):
+
+        """Write the buffered moves and trades into the columns."""
+
+        for pending, activity, names in ((self.pending_moves, MOVE, MOVE_COLUMNS), (self.pending_trades, TRADE, TRADE_COLUMNS)):
+
+            if not pending:
+
+                continue
+
+            # One array per buffered value, with float64 holding the ids and positions exactly.
+            rows, time, agent, *values = np.array(pending, dtype=np.float64).T
+
+            rows = rows.astype(np.int64)
+
+            self.columns["time"][rows] = time
+
+            self.columns["agent"][rows] = agent
+
+            self.columns["activity"][rows] = activity
+
+            for name, value in zip(names, values):
+
+                self.columns[name][rows] = value
+
+            pending.clear()
+
+    def __len__(self):
+
+        return self.size
+
+    def column(self, name):
+
+        """Return a view of the logged part of a column."""
+
+        self.commit()
+
+        return self.columns[name][:self.size]
+
+    def for_agent(self, agent):
+
+        history = self.histories.get(agent)
+
+        if history is None:
+
+            history = self.histories[agent] = AgentHistory(self, agent)
+
+        return history
+
+    def flush(self):
+
+        self.commit()
+
+        if self.path is not None:
+
+            for column in self.columns.values():
+
+                column.flush()
+
+
+class AgentHistory:
+
+    """The rows of an ActivityLog that belong to one agent.
+
+    Columns are read with history["wealth"] and so on. Iterating gives one
+    dict per activity, in the same shape the agents used to store. The row
+    indices are kept, and only the rows appended since the last access are
+    scanned for the agent.
+    """
+
+    def __init__(self, log, agent):
+
+        self.log = log
+
+        self.agent = agent
+
+        self.row_indices = np.empty(0, dtype=np.int64)
+
+        self.scanned = 0
+
+    def rows(self):
+
+        agents = self.log.column("agent")
+
+        if self.scanned < len(agents):
+
+            new_rows = np.flatnonzero(agents[self.scanned:] == self.agent) + self.scanned
+
+            self.row_indices = np.concatenate([self.row_indices, new_rows])
+
+            self.scanned = len(agents)
+
+        return self.row_indices
+
+    def __getitem__(self, name):
+
+        return self.log.column(name)[self.rows()]
+
+    def __len__(self):
+
+        return len(self.rows())
+
+    def __iter__(self):
+
+        columns = self.log.columns
+
+        for row in self.rows():
+
+            if columns["activity"][row] == MOVE:
+
+                yield {'time': int(columns["time"][row]),
+                       'activity': 'move',
+                       'old_pos': (int(columns["old_x"][row]), int(columns["old_y"][row])),
+                       'new_pos': (int(columns["new_x"][row]), int(columns["new_y"][row]))}
+
+            else:
+
+                yield {'time': int(columns["time"][row]),
+                       'activity': 'trade',
+                       'other': int(columns["other"][row]),
+                       'wealth': float(columns["wealth"][row]),
+                       'other_wealth': float(columns["other_wealth"][row])}
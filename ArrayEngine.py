@@ -0,0 +1,401 @@
+import numpy as np
+from time import perf_counter
+from CellIndex import CellIndex
+from OrderBook import BUY, SELL
+from Strategies import STRATEGIES, STRATEGY_LIST, lookup_strategy, strategy_counts
+
+# Moore neighbourhood offsets, excluding the centre cell.
+MOORE_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)])
+
+
+def rank_within_groups(keys):
+
+    """Return, for every element, its position among the elements with the same key."""
+
+    # Sort the keys, keeping the original order inside each group.
+    order = np.argsort(keys, kind="stable")
+
+    sorted_keys = keys[order]
+
+    # Find where every group starts in the sorted order.
+    is_start = np.ones(len(keys), dtype=bool)
+
+    is_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+
+    group_start = np.maximum.accumulate(np.where(is_start, np.arange(len(keys)), 0))
+
+    # Scatter the ranks back to the original order.
+    ranks = np.empty(len(keys), dtype=np.int64)
+
+    ranks[order] = np.arange(len(keys)) - group_start
+
+    return ranks
+
+
+class ArrayEngine:
+
+    """Struct-of-arrays state for a population of trading agents.
+
+    Agent state lives in NumPy arrays indexed by agent id, and a step runs
+    every phase as a batch: all agents move, then every agent with wealth
+    trades once with a uniformly chosen cellmate. Trade amounts are drawn
+    from the wealth at the start of the trade phase, so a batch never lets an
+    agent spend wealth it only received in the same step.
+
+    Given a TradeNetwork, the agents trade with a random neighbour in it
+    instead of a cellmate. Given an OrderBookMarket, the agents whose strategy quotes place limit
+    orders in it instead of trading with a cellmate, and the fills are
+    settled at the end of the trade phase.
+    """
+
+    def __init__(self, number_of_agents, width, height, strategy, wealth=1, market=None,
+                 unique_cells=True, mean_reversion_threshold=1.0, seed=None, order_book=None, network=None):
+
+        # A strategy name, or a {name: proportion} mix.
+        counts = strategy_counts(strategy, number_of_agents)
+
+        self.rng = np.random.default_rng(seed)
+
+        self.num_agents = number_of_agents
+
+        self.width = width
+
+        self.height = height
+
+        self.time = 0
+
+        self.mean_reversion_threshold = mean_reversion_threshold
+
+        # Place the agents, either one per cell or independently of each other.
+        number_of_cells = width * height
+
+        if unique_cells:
+
+            cells = self.rng.choice(number_of_cells, number_of_agents, replace=False)
+
+        else:
+
+            cells = self.rng.integers(0, number_of_cells, number_of_agents)
+
+        self.x = (cells // height).astype(np.int64)
+
+        self.y = (cells % height).astype(np.int64)
+
+        # Index of the agents in every cell, rebuilt after each move.
+        self.cell_index = CellIndex(number_of_cells)
+
+        # Per-agent state.
+        self.wealth = np.full(number_of_agents, wealth, dtype=np.float64)
+
+        # The registry id of every agent's strategy, with the agents of each strategy next to each other.
+        self.strategy = np.repeat(np.array([lookup_strategy(name).id for name, _ in counts], dtype=np.int8),
+                                  [count for _, count in counts])
+
+        self.transactions = np.zeros(number_of_agents, dtype=np.int64)
+
+        # Prices come from the market, and every agent starts with one unit of each of its assets.
+        self.market = market
+
+        number_of_assets = 0
+
+        if market is not None:
+
+            number_of_assets = len(market.get_assets())
+
+            for asset in market.get_assets():
+
+                asset.set_quantity(asset.get_quantity() + number_of_agents)
+
+        self.holdings = np.ones((number_of_agents, number_of_assets), dtype=np.int64)
+
+        self.order_book = order_book
+
+        self.network = network
+
+    def step(self, timer=None):
+
+        """Advance every agent by one step, timing the phases if given an enabled PhaseTimer."""
+
+        if timer is not None and timer.enabled:
+
+            started = perf_counter()
+
+            self.move()
+
+            moved = perf_counter()
+
+            timer.add("move", moved - started)
+
+            self.trade()
+
+            timer.add("trade", perf_counter() - moved)
+
+        else:
+
+            self.move()
+
+            self.trade()
+
+        self.time += 1
+
+    def move(self):
+
+        """Move every agent to a random cell of its Moore neighbourhood."""
+
+        offsets = MOORE_OFFSETS[self.rng.integers(0, len(MOORE_OFFSETS), self.num_agents)]
+
+        self.x = (self.x + offsets[:, 0]) % self.width
+
+        self.y = (self.y + offsets[:, 1]) % self.height
+
+    def cells(self):
+
+        """Return the flat cell index of every agent."""
+
+        return self.x * self.height + self.y
+
+    def match(self):
+
+        """Pair every agent with wealth with a random other agent in the same cell, or a random network neighbour."""
+
+        if self.network is not None:
+
+            initiators = np.flatnonzero((self.network.degree > 0) & (self.wealth > 0))
+
+            partners = self.network.random_neighbours(initiators, self.rng)
+
+        else:
+
+            self.cell_index.rebuild(self.cells())
+
+            # Only agents with wealth and at least one cellmate trade.
+            active = (self.cell_index.cellmate_counts() > 0) & (self.wealth > 0)
+
+            initiators = np.flatnonzero(active)
+
+            partners = self.cell_index.choose_partners(initiators, self.rng)
+
+        # Shuffle so that conflicting trades are resolved in a random order.
+        shuffle = self.rng.permutation(len(initiators))
+
+        return initiators[shuffle], partners[shuffle]
+
+    def trade(self):
+
+        """Run one batched trade for every matched pair."""
+
+        initiators, partners = self.match()
+
+        self.transactions[initiators] += 1
+
+        # Group the pairs by strategy, keeping their shuffled order, and run each group through its batch kernel.
+        strategies = self.strategy[initiators]
+
+        order = np.argsort(strategies, kind="stable")
+
+        counts = np.bincount(strategies, minlength=len(STRATEGY_LIST))
+
+        starts = np.cumsum(counts) - counts
+
+        for strategy_id in np.flatnonzero(counts):
+
+            if self.order_book is not None and STRATEGY_LIST[strategy_id].quotes:
+
+                continue
+
+            group = order[starts[strategy_id]:starts[strategy_id] + counts[strategy_id]]
+
+            STRATEGY_LIST[strategy_id].trade_batch(self, initiators[group], partners[group])
+
+        if self.order_book is not None:
+
+            self.quote()
+
+    def quote(self):
+
+        """Submit the orders of every quoting agent to the order book, in random order, and settle the fills."""
+
+        quotes = [STRATEGY_LIST[strategy_id].quote_batch(self, np.flatnonzero(self.strategy == strategy_id))
+                  for strategy_id in np.unique(self.strategy) if STRATEGY_LIST[strategy_id].quotes]
+
+        if quotes:
+
+            owners, assets, sides, prices = (np.concatenate(columns) for columns in zip(*quotes))
+
+            shuffle = self.rng.permutation(len(owners))
+
+            self.order_book.submit_batch(owners[shuffle], assets[shuffle], sides[shuffle], prices[shuffle])
+
+        self.order_book.settle_arrays(self)
+
+    def quotable(self, agents, assets, sides, prices):
+
+        """Keep the bids an agent can pay for and the offers of assets it holds."""
+
+        ok = np.where(sides == BUY, self.wealth[agents] >= prices, self.holdings[agents, assets] > 0)
+
+        return agents[ok], assets[ok], sides[ok], prices[ok]
+
+    def random_quotes(self, agents, spread):
+
+        """Bid for or offer a random asset at a random limit within spread of its price."""
+
+        assets = self.rng.integers(0, self.holdings.shape[1], len(agents))
+
+        prices = self.market.get_prices()[assets] * (1 + self.rng.uniform(-spread, spread, len(agents)))
+
+        sides = np.where(self.rng.random(len(agents)) < 0.5, BUY, SELL)
+
+        return self.quotable(agents, assets, sides, prices)
+
+    def signal_quotes(self, agents, signals):
+
+        """Bid for a random asset whose signal is BUY, or offer one whose signal is SELL, at the current price."""
+
+        assets = self.rng.integers(0, self.holdings.shape[1], len(agents))
+
+        sides = signals[assets]
+
+        signalled = sides != 0
+
+        return self.quotable(agents[signalled], assets[signalled], sides[signalled], self.market.get_prices()[assets[signalled]])
+
+    def transfer(self, payers, payees, amounts):
+
+        """Move wealth from payers to payees. Payers are unique within a batch."""
+
+        self.wealth[payers] -= amounts
+
+        np.add.at(self.wealth, payees, amounts)
+
+    def give_money(self, agents, others):
+
+        self.transfer(agents, others, np.ones(len(agents)))
+
+    def wealth_trade(self, agents, others):
+
+        whole_wealth = np.floor(self.wealth[agents])
+
+        ok = (self.wealth[others] > 0) & (whole_wealth >= 1)
+
+        amounts = self.rng.integers(1, whole_wealth[ok].astype(np.int64) + 1)
+
+        self.transfer(agents[ok], others[ok], amounts)
+
+    def barter_trade(self, agents, others):
+
+        other_wealth = np.floor(self.wealth[others])
+
+        ok = other_wealth >= 1
+
+        amounts = self.rng.integers(1, other_wealth[ok].astype(np.int64) + 1)
+
+        self.transfer(agents[ok], others[ok], amounts)
+
+    def gift_trade(self, agents, others):
+
+        difference = np.floor(self.wealth[agents] - self.wealth[others])
+
+        ok = difference >= 1
+
+        amounts = self.rng.integers(1, difference[ok].astype(np.int64) + 1)
+
+        self.transfer(agents[ok], others[ok], amounts)
+
+    def asset_trade(self, agents, others):
+
+        """Buy a random unit of a random asset from the other agent at the current price."""
+
+        holdings = self.holdings[others]
+
+        totals = holdings.sum(axis=1)
+
+        has_assets = totals > 0
+
+        agents, others, holdings, totals = agents[has_assets], others[has_assets], holdings[has_assets], totals[has_assets]
+
+        # Choose an asset weighted by how many units the other agent holds.
+        draws = self.rng.random(len(others)) * totals
+
+        assets = (np.cumsum(holdings, axis=1) > draws[:, None]).argmax(axis=1)
+
+        prices = self.market.get_prices()[assets]
+
+        ok = self.wealth[agents] >= prices
+
+        self.exchange(agents[ok], others[ok], assets[ok], prices[ok])
+
+    def signal_trade(self, agents, others, signals):
+
+        """Trade a random asset at its current price: buy it from the other agent on BUY, sell it to the other on SELL."""
+
+        assets = self.rng.integers(0, self.holdings.shape[1], len(agents))
+
+        prices = self.market.get_prices()[assets]
+
+        sides = signals[assets]
+
+        buy = (sides == BUY) & (self.wealth[agents] >= prices)
+
+        self.exchange(agents[buy], others[buy], assets[buy], prices[buy])
+
+        # The sales run after the purchases, against the wealth and holdings they left. A
+        # buyer can be the other agent of several pairs, so only its first pair goes ahead.
+        sell = sides == SELL
+
+        agents, others, assets, prices = agents[sell], others[sell], assets[sell], prices[sell]
+
+        ok = (rank_within_groups(others) == 0) & (self.wealth[others] >= prices) & (self.holdings[agents, assets] > 0)
+
+        self.exchange(others[ok], agents[ok], assets[ok], prices[ok])
+
+    def exchange(self, buyers, sellers, assets, prices):
+
+        """Hand a unit of each asset from the seller to the buyer for its price. Buyers are unique within a batch."""
+
+        # A seller can only hand over as many units as it held at the start of the batch.
+        in_stock = rank_within_groups(sellers * self.holdings.shape[1] + assets) < self.holdings[sellers, assets]
+
+        buyers, sellers, assets, prices = buyers[in_stock], sellers[in_stock], assets[in_stock], prices[in_stock]
+
+        np.add.at(self.holdings, (buyers, assets), 1)
+
+        np.subtract.at(self.holdings, (sellers, assets), 1)
+
+        self.transfer(buyers, sellers, prices)
+
+    def mean_reversion(self, agents, others):
+
+        STRATEGIES["Mean Reversion"].trade_batch(self, agents, others)
+
+    def compute_gini(self):
+
+        """Compute the Gini coefficient of the wealth array."""
+
+        x = np.sort(self.wealth)
+
+        N = self.num_agents
+
+        B = np.sum(x * (N - np.arange(N))) / (N * np.sum(x))
+
+        return float(1 + (1 / N) - 2 * B)
+
+    def get_wealthiest_agent(self):
+
+        return float(self.wealth.max())
+
+    def compute_avg_wealth(self):
+
+        return float(self.wealth.mean())
+
+    def current_wealthy_agents(self):
+
+        return int(np.count_nonzero(self.wealth > 0))
+
+    def current_non_wealthy_agents(self):
+
+        return int(np.count_nonzero(self.wealth <= 0))
+
+    def total_transactions(self):
+
+        return int(self.transactions.sum())
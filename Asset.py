@@ -1,5 +1,8 @@
+from PriceHistory import PriceHistory
+from Indicators import Indicators
+
 class Asset:
-    def __init__(self, name: str, price: float, quantity: int):
+    def __init__(self, name: str, price: float, quantity: int, history_window: int = 1000):
 
         self.name = name
 
@@ -7,8 +10,13 @@ class Asset:
 
         self.quantity = quantity
 
-        # Initialize the list with the initial price
-        self.historical_prices = [price] 
+        # Initialize the price history with the initial price, keeping at most history_window prices (None keeps all)
+        self.historical_prices = PriceHistory(history_window)
+
+        self.historical_prices.append(price)
+
+        # Indicators shared by every agent that looks at this asset, updated with every new price.
+        self.indicators = Indicators(price)
 
         self.demand = 1
 
@@ -29,12 +37,21 @@ class Asset:
 
     def get_mean_price(self):
 
-        return sum(self.historical_prices) / len(self.historical_prices)
+        return self.historical_prices.mean()
+
+    def get_window_mean_price(self):
+
+        return self.historical_prices.window_mean()
+
+    def get_price_variance(self):
+
+        return self.historical_prices.variance()
     
     def update_price(self, new_price):
 
         self.price = new_price
         self.historical_prices.append(new_price)
+        self.indicators.update(new_price)
 
     def set_name(self, name):
 
@@ -0,0 +1,174 @@
+import threading
+from time import perf_counter
+import tornado.escape
+import tornado.ioloop
+from mesa.visualization.ModularVisualization import ModularServer, SocketHandler
+
+
+class BackgroundSocketHandler(SocketHandler):
+
+    """Answers every frame request with the latest state instead of stepping the model."""
+
+    def on_message(self, message):
+
+        msg = tornado.escape.json_decode(message)
+
+        application = self.application
+
+        if msg["type"] == "get_step":
+
+            application.request_frame()
+
+            # Hold the frame back to keep under the frame rate cap.
+            tornado.ioloop.IOLoop.current().call_later(application.frame_delay(), self.send_frame)
+
+        elif msg["type"] == "reset":
+
+            application.reset_model()
+
+            self.send_frame()
+
+        else:
+
+            super().on_message(message)
+
+    def send_frame(self):
+
+        application = self.application
+
+        with application.pause_worker():
+
+            # Finish once the last state of a model that stopped running has been sent.
+            if not application.model.running and application.model.schedule.steps == application.frame_steps:
+
+                self.write_message({"type": "end"})
+
+                return
+
+            message = self.viz_state_message
+
+            application.frame_steps = application.model.schedule.steps
+
+        application.last_frame = perf_counter()
+
+        self.write_message(message)
+
+
+class BackgroundServer(ModularServer):
+
+    """A ModularServer that steps the model in a worker thread, as fast as it can.
+
+    The browser asks for a frame whenever it has drawn the previous one, and
+    gets the state of whatever step the worker has reached, so the steps in
+    between are never rendered and a slow browser never slows the model
+    down. Frames are sent at most max_fps times per second.
+
+    A frame request after a pause steps the model once, as the Step button
+    does. Once requests come within lease_seconds of each other, as they do
+    while the browser runs, the worker takes over, and it pauses when there
+    has been none for lease_seconds.
+    """
+
+    def __init__(self, model_cls, visualization_elements, name="Mesa Model", model_params=None, port=None,
+                 max_fps=20, lease_seconds=1.0):
+
+        self.max_fps = max_fps
+
+        self.lease_seconds = lease_seconds
+
+        # The worker only steps the model while it holds this condition's lock.
+        self.condition = threading.Condition()
+
+        self.frame_requested = False
+
+        self.lease_until = 0
+
+        self.last_request = 0
+
+        self.last_frame = 0
+
+        self.frame_steps = None
+
+        super().__init__(model_cls, visualization_elements, name, model_params, port)
+
+        # Route the websocket to the handler above instead of the stock one.
+        self.add_handlers(r".*", [(r"/ws", BackgroundSocketHandler)])
+
+        self.worker = threading.Thread(target=self.work, daemon=True)
+
+        self.worker.start()
+
+    def reset_model(self):
+
+        with self.pause_worker():
+
+            super().reset_model()
+
+            self.lease_until = 0
+
+            self.last_request = 0
+
+            self.frame_steps = None
+
+    def request_frame(self):
+
+        """Step once after a pause, or keep the worker running while the browser keeps asking."""
+
+        with self.pause_worker():
+
+            now = perf_counter()
+
+            if now - self.last_request < self.lease_seconds:
+
+                self.lease_until = now + self.lease_seconds
+
+            elif self.model.running:
+
+                self.model.step()
+
+            self.last_request = now
+
+    def frame_delay(self):
+
+        return max(0, self.last_frame + 1 / self.max_fps - perf_counter())
+
+    def pause_worker(self):
+
+        """Return a context that holds the worker between two steps, and wakes it up afterwards."""
+
+        return PausedWorker(self)
+
+    def work(self):
+
+        while True:
+
+            with self.condition:
+
+                while self.frame_requested or not self.model.running or perf_counter() >= self.lease_until:
+
+                    # Wake up again when the lease runs out, in case no frame is requested after it.
+                    self.condition.wait(max(self.lease_until - perf_counter(), 0) or None)
+
+                self.model.step()
+
+
+class PausedWorker:
+
+    def __init__(self, server):
+
+        self.server = server
+
+    def __enter__(self):
+
+        # Ask the worker to wait before it takes the next step, so the lock is free for us.
+        self.server.frame_requested = True
+
+        self.server.condition.acquire()
+
+    def __exit__(self, *exc_info):
+
+        self.server.frame_requested = False
+
+        self.server.condition.notify_all()
+
+        self.server.condition.release()
@@ -0,0 +1,67 @@
+// Draws the frames of a BatchedChartModule. Every frame carries all of the
+// points collected since the previous one, with their steps as labels, and
+// the chart is redrawn once per frame. Only the last max_points points are
+// kept, so the chart slides along with a long run.
+const BatchedChartModule = function (series, canvas_width, canvas_height, max_points) {
+  const canvas = document.createElement("canvas");
+  Object.assign(canvas, {
+    width: canvas_width,
+    height: canvas_height,
+    style: "border:1px dotted",
+  });
+  document.getElementById("elements").appendChild(canvas);
+
+  const convertColorOpacity = (hex) => {
+    if (hex.indexOf("#") != 0) {
+      return "rgba(0,0,0,0.1)";
+    }
+
+    hex = hex.replace("#", "");
+    const r = parseInt(hex.substring(0, 2), 16);
+    const g = parseInt(hex.substring(2, 4), 16);
+    const b = parseInt(hex.substring(4, 6), 16);
+    return `rgba(${r},${g},${b},0.1)`;
+  };
+
+  const datasets = series.map((s) => ({
+    label: s.Label,
+    borderColor: s.Color,
+    backgroundColor: convertColorOpacity(s.Color),
+    // A series with "Fill": "-1" shades the area down to the series before it.
+    ...(s.Fill !== undefined && { fill: s.Fill }),
+    data: [],
+  }));
+
+  const chart = new Chart(canvas.getContext("2d"), {
+    type: "line",
+    data: { labels: [], datasets: datasets },
+    options: {
+      responsive: true,
+      animation: false,
+      tooltips: { mode: "index", intersect: false },
+      hover: { mode: "nearest", intersect: true },
+      scales: {
+        x: { display: true, title: { display: true }, ticks: { maxTicksLimit: 11 } },
+        y: { display: true, title: { display: true } },
+      },
+    },
+  });
+
+  this.render = (data) => {
+    if (data.steps.length === 0) return;
+    chart.data.labels.push(...data.steps);
+    data.values.forEach((values, i) => chart.data.datasets[i].data.push(...values));
+    const excess = chart.data.labels.length - max_points;
+    if (excess > 0) {
+      chart.data.labels.splice(0, excess);
+      chart.data.datasets.forEach((dataset) => dataset.data.splice(0, excess));
+    }
+    chart.update();
+  };
+
+  this.reset = () => {
+    chart.data.labels.length = 0;
+    chart.data.datasets.forEach((dataset) => (dataset.data.length = 0));
+    chart.update();
+  };
+};
@@ -0,0 +1,60 @@
+from mesa.visualization.modules import ChartModule
+
+
+class BatchedChartModule(ChartModule):
+
+    """A ChartModule that sends every point collected since the previous frame.
+
+    The stock ChartModule only sends the latest value, so a chart misses the
+    steps that ran between two frames. This one sends all of them at once,
+    labelled with their step, and the browser redraws the chart once per
+    frame. The chart keeps only the last max_points points, so a long run
+    does not slow the browser down.
+    """
+
+    package_includes = [ChartModule.package_includes[0]]
+
+    local_includes = ["BatchedChartModule.js"]
+
+    def __init__(self, series, canvas_height=200, canvas_width=500, data_collector_name="datacollector", max_points=1000):
+
+        super().__init__(series, canvas_height, canvas_width, data_collector_name)
+
+        self.max_points = max_points
+
+        self.js_code = self.js_code.replace("new ChartModule(", "new BatchedChartModule(").replace("));", ", " + str(max_points) + "));")
+
+        self.model = None
+
+        self.sent = 0
+
+    def render(self, model):
+
+        data_collector = getattr(model, self.data_collector_name)
+
+        # Start again for a new model.
+        if model is not self.model:
+
+            self.model = model
+
+            self.sent = 0
+
+        collected = max((len(data_collector.model_vars.get(s["Label"], [])) for s in self.series), default=0)
+
+        # The chart would drop anything older than its last max_points points anyway.
+        start = max(self.sent, collected - self.max_points)
+
+        values = []
+
+        for s in self.series:
+
+            series = data_collector.model_vars.get(s["Label"])
+
+            values.append(series[start:collected] if series else [0] * (collected - start))
+
+        # One point was collected per step, up to the current one.
+        steps = list(range(model.schedule.steps - (collected - start) + 1, model.schedule.steps + 1))
+
+        self.sent = collected
+
+        return {"steps": steps, "values": values}
@@ -0,0 +1,189 @@
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+import numpy as np
+import FinancialModel
+import model
+
+# The strategies each model understands.
+MODELS = {
+    "FinancialModel": (FinancialModel.FinancialModel, ["Asset Trading", "Wealth Trading", "Mean Reversion", "Momentum"]),
+    "legacy": (model.FinancialModel, ["Random", "Barter", "Gift"]),
+}
+
+
+def case_key(case):
+
+    return "{model}|{strategy}|{number_of_agents}|{width}x{height}|{engine}".format(**case)
+
+
+def build_cases(agent_counts, sizes, engines, models=MODELS):
+
+    """Return a benchmark case for every model, strategy, agent count, grid size and engine."""
+
+    cases = []
+
+    for model_name, (_, strategies) in models.items():
+
+        for strategy in strategies:
+
+            for number_of_agents in agent_counts:
+
+                for width, height in sizes:
+
+                    for engine in engines:
+
+                        cases.append({
+                            "model": model_name,
+                            "strategy": strategy,
+                            "number_of_agents": number_of_agents,
+                            "width": width,
+                            "height": height,
+                            "engine": engine,
+                        })
+
+    return cases
+
+
+def run_case(case, steps, seed=0, measure_memory=True):
+
+    """Time every step of one case and return its throughput, latency percentiles and peak memory."""
+
+    model_class = MODELS[case["model"]][0]
+
+    def create():
+
+        return model_class(case["number_of_agents"], case["width"], case["height"], case["strategy"],
+                           engine=case["engine"], seed=seed)
+
+    started = time.perf_counter()
+
+    simulation = create()
+
+    setup_seconds = time.perf_counter() - started
+
+    latencies = np.empty(steps)
+
+    for step in range(steps):
+
+        started = time.perf_counter()
+
+        simulation.step()
+
+        latencies[step] = time.perf_counter() - started
+
+    result = dict(case)
+
+    result.update({
+        "steps": steps,
+        "setup_seconds": setup_seconds,
+        "steps_per_second": steps / latencies.sum(),
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p90_ms": float(np.percentile(latencies, 90) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+    })
+
+    # Measure the memory in a second run, because tracing slows the steps down.
+    if measure_memory:
+
+        tracemalloc.start()
+
+        simulation = create()
+
+        for step in range(steps):
+
+            simulation.step()
+
+        result["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+
+        tracemalloc.stop()
+
+    return result
+
+
+def run_benchmarks(cases, steps, seed=0, measure_memory=True):
+
+    results = {}
+
+    for case in cases:
+
+        result = run_case(case, steps, seed, measure_memory)
+
+        results[case_key(case)] = result
+
+        print("{}: {:.1f} steps/s, p50 {:.2f} ms, p99 {:.2f} ms".format(
+            case_key(case), result["steps_per_second"], result["latency_p50_ms"], result["latency_p99_ms"]))
+
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+
+    """Return the cases whose throughput dropped by more than tolerance against the baseline."""
+
+    regressions = []
+
+    for key, result in results.items():
+
+        if key not in baseline:
+
+            continue
+
+        ratio = result["steps_per_second"] / baseline[key]["steps_per_second"]
+
+        if ratio < 1 - tolerance:
+
+            regressions.append((key, ratio))
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the step throughput of the financial models.")
+
+    parser.add_argument("--agents", type=int, nargs="+", default=[100, 1000])
+
+    parser.add_argument("--sizes", nargs="+", default=["50x50"], help="grid sizes as WIDTHxHEIGHT")
+
+    parser.add_argument("--engines", nargs="+", default=["agents", "array"])
+
+    parser.add_argument("--steps", type=int, default=50)
+
+    parser.add_argument("--seed", type=int, default=0)
+
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement")
+
+    parser.add_argument("--output", default="benchmark_results.json")
+
+    parser.add_argument("--baseline", help="results file to compare against")
+
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative drop in steps/sec")
+
+    args = parser.parse_args()
+
+    sizes = [tuple(int(side) for side in size.lower().split("x")) for size in args.sizes]
+
+    results = run_benchmarks(build_cases(args.agents, sizes, args.engines), args.steps, args.seed, not args.no_memory)
+
+    with open(args.output, "w") as file:
+
+        json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, file, indent=2)
+
+    print("Results are in " + args.output + ".")
+
+    if args.baseline:
+
+        with open(args.baseline) as file:
+
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+
+        for key, ratio in regressions:
+
+            print("Regression in " + key + ": " + str(round(ratio * 100)) + "% of the baseline throughput.")
+
+        if regressions:
+
+            raise SystemExit(1)
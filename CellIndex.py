@@ -0,0 +1,119 @@
+import numpy as np
+
+
+def choose_cellmate(grid, agent, random):
+
+    """Return a uniformly chosen other agent in the agent's MultiGrid cell, or None if it is alone.
+
+    Reads the cell's list in place, so nothing is allocated, and needs no
+    retries to avoid choosing the agent itself.
+    """
+
+    x, y = agent.pos
+
+    cellmates = grid.grid[x][y]
+
+    if len(cellmates) < 2:
+
+        return None
+
+    # Choose among all but the last cellmate, and swap the agent itself for the last one.
+    other = cellmates[random.randrange(len(cellmates) - 1)]
+
+    if other is agent:
+
+        other = cellmates[-1]
+
+    return other
+
+
+class CellIndex:
+
+    """A cell to occupants index over flat cell numbers.
+
+    rebuild() lays the agents out grouped by cell, with a start offset and a
+    count per cell, as in a counting sort. The occupants of a cell are then a
+    contiguous slice of `order`, and partners and co-located pairs can be
+    found for the whole population at once.
+    """
+
+    def __init__(self, number_of_cells):
+
+        self.number_of_cells = number_of_cells
+
+        self.cells = np.empty(0, dtype=np.int64)
+
+        self.counts = np.zeros(number_of_cells, dtype=np.int64)
+
+        self.starts = np.zeros(number_of_cells, dtype=np.int64)
+
+        self.order = np.empty(0, dtype=np.int64)
+
+        self.position = np.empty(0, dtype=np.int64)
+
+    def rebuild(self, cells):
+
+        """Index the agents from the cell number of every agent."""
+
+        self.cells = cells
+
+        self.counts = np.bincount(cells, minlength=self.number_of_cells)
+
+        self.starts = np.cumsum(self.counts) - self.counts
+
+        self.order = np.argsort(cells, kind="stable")
+
+        # Where every agent sits in the grouped layout.
+        self.position = np.empty(len(cells), dtype=np.int64)
+
+        self.position[self.order] = np.arange(len(cells))
+
+    def occupants(self, cell):
+
+        start = self.starts[cell]
+
+        return self.order[start:start + self.counts[cell]]
+
+    def cellmate_counts(self, agents=None):
+
+        """Return how many other agents share each agent's cell."""
+
+        cells = self.cells if agents is None else self.cells[agents]
+
+        return self.counts[cells] - 1
+
+    def choose_partners(self, agents, rng):
+
+        """Choose a uniformly random cellmate for every agent. Each agent must have one."""
+
+        cells = self.cells[agents]
+
+        starts = self.starts[cells]
+
+        rank = self.position[agents] - starts
+
+        # Choose among the other cellmates by skipping over the agent's own slot.
+        pick = rng.integers(0, self.counts[cells] - 1)
+
+        pick += pick >= rank
+
+        return self.order[starts + pick]
+
+    def pairs(self):
+
+        """Return every unordered pair of agents that share a cell, as two arrays."""
+
+        positions = np.arange(len(self.order))
+
+        group_end = self.starts[self.cells[self.order]] + self.counts[self.cells[self.order]]
+
+        # Pair every agent with the agents after it in its cell.
+        later = group_end - positions - 1
+
+        first = np.repeat(positions, later)
+
+        offsets = np.arange(len(first)) - np.repeat(np.cumsum(later) - later, later)
+
+        second = first + 1 + offsets
+
+        return self.order[first], self.order[second]
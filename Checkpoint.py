@@ -0,0 +1,401 @@
+import json
+import random
+from collections import OrderedDict
+import numpy as np
+from mesa.space import MultiGrid
+from GiniTracker import FenwickTree, GiniTracker
+from PriceProcess import PRICE_PROCESSES
+from TradeNetwork import TradeNetwork
+
+
+def save_checkpoint(model, path):
+
+    """Write the full state of a FinancialModel to a compressed .npz file.
+
+    The file holds the agents (in schedule order and in the order they sit in
+    their grid cells), the market prices and price histories, the Gini
+    tracker, the random number generator states and the collector and
+    activity log buffers, so a restored model continues bit-identically.
+    """
+
+    arrays = {}
+
+    meta = {
+        "num_agents": model.num_agents,
+        "width": model.grid.width,
+        "height": model.grid.height,
+        "strategy": model.strategy,
+        "engine": model.engine,
+        "activation": model.activation,
+        "order_book": model.order_book is not None,
+        "topology": model.topology,
+        "seed": model.seed,
+        "time_phases": model.phase_timer.enabled,
+        "steps": model.schedule.steps,
+        "time": model.schedule.time,
+    }
+
+    # The Mersenne Twister state is 625 words, plus the cached Gaussian value.
+    version, words, gauss_next = model.random.getstate()
+
+    meta["random"] = {"version": version, "gauss_next": gauss_next}
+
+    arrays["random_state"] = np.array(words, dtype=np.uint32)
+
+    # Market prices and price histories.
+    meta["assets"] = []
+
+    for i, asset in enumerate(model.market.get_assets()):
+
+        history = asset.historical_prices
+
+        meta["assets"].append({
+            "price": asset.price,
+            "quantity": asset.quantity,
+            "demand": asset.demand,
+            "supply": asset.supply,
+            "window": history.window,
+            "head": history.head,
+            "size": history.size,
+            "count": history.count,
+            "running_mean": history.running_mean,
+            "squared_deviations": history.squared_deviations,
+            "minimum": history.minimum,
+            "maximum": history.maximum,
+            "window_sum": history.window_sum,
+            "indicators": asset.indicators.get_state(),
+        })
+
+        arrays["price_history_" + str(i)] = history.prices
+
+        arrays["indicator_prices_" + str(i)] = asset.indicators.prices
+
+    if model.network is not None:
+
+        arrays["network_indptr"] = model.network.indptr
+
+        arrays["network_indices"] = model.network.indices
+
+    if model.price_process is not None:
+
+        save_price_process(model.price_process, arrays, meta)
+
+    if model.array_engine is not None:
+
+        save_array_engine(model.array_engine, arrays, meta)
+
+    else:
+
+        save_agents(model, arrays, meta)
+
+    # Collector buffers.
+    meta["model_vars"] = list(model.metrics.model_vars.keys())
+
+    for i, values in enumerate(model.metrics.model_vars.values()):
+
+        arrays["model_var_" + str(i)] = np.array(values)
+
+    records = [record for step_records in model.metrics._agent_records.values() for record in step_records]
+
+    arrays["agent_records"] = np.array(records, dtype=np.float64).reshape(len(records), 2 + len(model.metrics.agent_reporters))
+
+    # Activity log.
+    for name in model.activity_log.columns:
+
+        arrays["activity_" + name] = model.activity_log.column(name)
+
+    arrays["meta"] = np.array(json.dumps(meta))
+
+    np.savez_compressed(path, **arrays)
+
+
+def save_agents(model, arrays, meta):
+
+    agents = model.schedule.agents
+
+    asset_names = model.market.get_asset_names()
+
+    # Schedule order, which the random activation shuffles from.
+    arrays["schedule_order"] = np.array([agent.unique_id for agent in agents], dtype=np.int64)
+
+    # Grid order, cell by cell, which choosing a cellmate depends on.
+    grid_order = [agent for column in model.grid.grid for cell in column for agent in cell]
+
+    arrays["grid_order"] = np.array([agent.unique_id for agent in grid_order], dtype=np.int64)
+
+    arrays["grid_x"] = np.array([agent.pos[0] for agent in grid_order], dtype=np.int64)
+
+    arrays["grid_y"] = np.array([agent.pos[1] for agent in grid_order], dtype=np.int64)
+
+    # Agent attributes, keeping whole-number wealth as int where it was an int.
+    arrays["wealth"] = np.array([agent.wealth for agent in agents], dtype=np.float64)
+
+    arrays["wealth_is_int"] = np.array([isinstance(agent.wealth, int) for agent in agents])
+
+    arrays["threshold"] = np.array([agent.mean_reversion_threshold for agent in agents], dtype=np.float64)
+
+    meta["strategies"] = [agent.strategy for agent in agents]
+
+    meta["moods"] = [agent.mood for agent in agents]
+
+    # Asset lists, in order, as asset type indices with an offset per agent.
+    arrays["asset_offsets"] = np.cumsum([0] + [len(agent.assets) for agent in agents])
+
+    arrays["asset_types"] = np.array([asset_names.index(asset.name) for agent in agents for asset in agent.assets], dtype=np.int8)
+
+    # Gini tracker, including its trees, so its rounding matches an uninterrupted run.
+    tracker = model.gini_tracker
+
+    # A model whose prices are not multiples of the resolution has no tracker.
+    if tracker is None:
+
+        meta["gini_tracker"] = None
+
+        return
+
+    meta["gini_tracker"] = {
+        "resolution": tracker.resolution,
+        "count": tracker.count,
+        "total": tracker.total,
+        "offset": tracker.offset,
+        "pair_sum": tracker.pair_sum,
+    }
+
+    arrays["gini_bucket_counts"] = np.array(tracker.bucket_counts, dtype=np.int64)
+
+    arrays["gini_bucket_sums"] = np.array(tracker.bucket_sums, dtype=np.float64)
+
+    arrays["gini_count_tree"] = np.array(tracker.counts.tree, dtype=np.int64)
+
+    arrays["gini_sum_tree"] = np.array(tracker.sums.tree, dtype=np.float64)
+
+
+def save_array_engine(engine, arrays, meta):
+
+    for name in ("x", "y", "wealth", "strategy", "transactions", "holdings"):
+
+        arrays["engine_" + name] = getattr(engine, name)
+
+    meta["engine_time"] = engine.time
+
+    meta["engine_rng"] = engine.rng.bit_generator.state
+
+
+def save_price_process(process, arrays, meta):
+
+    state = process.get_state()
+
+    meta["price_process"] = {
+        "name": process.name,
+        "parameters": {name: value.tolist() if isinstance(value, np.ndarray) else value
+                       for name, value in process.parameters().items()},
+        "position": state["position"],
+        "ticks": state["ticks"],
+        "rng": state["rng"],
+    }
+
+    arrays["price_process_prices"] = state["prices"]
+
+    if state["block"] is not None:
+
+        arrays["price_process_block"] = state["block"]
+
+
+def load_price_process(process, arrays, meta):
+
+    state = meta["price_process"]
+
+    block = arrays.get("price_process_block")
+
+    process.set_state({
+        "block": None if block is None else block.copy(),
+        "position": state["position"],
+        "prices": arrays["price_process_prices"].copy(),
+        "ticks": state["ticks"],
+        "rng": state["rng"],
+    })
+
+
+def load_checkpoint(model_class, path):
+
+    """Create a model from a file written by save_checkpoint."""
+
+    with np.load(path) as data:
+
+        arrays = dict(data)
+
+    meta = json.loads(str(arrays["meta"]))
+
+    price_process = None
+
+    if "price_process" in meta:
+
+        price_process = PRICE_PROCESSES[meta["price_process"]["name"]](**meta["price_process"]["parameters"])
+
+    # Give the model its saved network rather than generating it again.
+    topology = meta.get("topology", "grid")
+
+    if "network_indptr" in arrays:
+
+        topology = TradeNetwork(arrays["network_indptr"], arrays["network_indices"])
+
+    model = model_class(meta["num_agents"], meta["width"], meta["height"], meta["strategy"],
+                        engine=meta["engine"], seed=meta["seed"], time_phases=meta["time_phases"],
+                        activation=meta["activation"], order_book=meta.get("order_book", False),
+                        price_process=price_process, topology=topology)
+
+    model.topology = meta.get("topology", "grid")
+
+    if price_process is not None:
+
+        load_price_process(price_process, arrays, meta)
+
+    model.schedule.steps = meta["steps"]
+
+    model.schedule.time = meta["time"]
+
+    # Give the model its own generator, as mesa keeps the one made in __new__ on the class.
+    model.random = random.Random()
+
+    model.random.setstate((meta["random"]["version"], tuple(int(word) for word in arrays["random_state"]), meta["random"]["gauss_next"]))
+
+    for i, asset in enumerate(model.market.get_assets()):
+
+        state = meta["assets"][i]
+
+        history = asset.historical_prices
+
+        asset.price = state["price"]
+
+        asset.quantity = state["quantity"]
+
+        asset.demand = state["demand"]
+
+        asset.supply = state["supply"]
+
+        history.prices = arrays["price_history_" + str(i)].copy()
+
+        for name in ("window", "head", "size", "count", "running_mean", "squared_deviations", "minimum", "maximum", "window_sum"):
+
+            setattr(history, name, state[name])
+
+        asset.indicators.set_state(arrays["indicator_prices_" + str(i)].copy(), state["indicators"])
+
+    if model.array_engine is not None:
+
+        load_array_engine(model.array_engine, arrays, meta)
+
+    else:
+
+        load_agents(model, arrays, meta)
+
+    # Collector buffers.
+    for i, name in enumerate(meta["model_vars"]):
+
+        model.metrics.model_vars[name] = arrays["model_var_" + str(i)].tolist()
+
+    model.metrics._agent_records = {}
+
+    for record in arrays["agent_records"]:
+
+        step, unique_id = int(record[0]), int(record[1])
+
+        model.metrics._agent_records.setdefault(step, []).append((step, unique_id) + tuple(record[2:].tolist()))
+
+    # Activity log.
+    log = model.activity_log
+
+    if log.capacity < len(arrays["activity_time"]):
+
+        log.grow(len(arrays["activity_time"]))
+
+    for name in log.columns:
+
+        log.columns[name][:len(arrays["activity_" + name])] = arrays["activity_" + name]
+
+    log.size = len(arrays["activity_time"])
+
+    return model
+
+
+def load_agents(model, arrays, meta):
+
+    agents_by_id = {agent.unique_id: agent for agent in model.schedule.agents}
+
+    asset_list = model.market.get_assets()
+
+    # Stop the tracker from following the wealth as it is restored.
+    model.gini_tracker = None
+
+    # Restore the schedule order.
+    model.schedule._agents = OrderedDict((int(unique_id), agents_by_id[int(unique_id)]) for unique_id in arrays["schedule_order"])
+
+    # Restore the agent attributes.
+    offsets = arrays["asset_offsets"]
+
+    for i, agent in enumerate(model.schedule.agents):
+
+        wealth = arrays["wealth"][i]
+
+        agent.wealth = int(wealth) if arrays["wealth_is_int"][i] else float(wealth)
+
+        agent.mean_reversion_threshold = float(arrays["threshold"][i])
+
+        agent.strategy = meta["strategies"][i]
+
+        agent.mood = meta["moods"][i]
+
+        agent.assets = [asset_list[asset_type] for asset_type in arrays["asset_types"][offsets[i]:offsets[i + 1]]]
+
+    # Place the agents again in the same order within every cell.
+    model.grid = MultiGrid(meta["width"], meta["height"], True)
+
+    for unique_id, x, y in zip(arrays["grid_order"], arrays["grid_x"], arrays["grid_y"]):
+
+        model.grid.place_agent(agents_by_id[int(unique_id)], (int(x), int(y)))
+
+    # Restore the Gini tracker as it was.
+    state = meta["gini_tracker"]
+
+    if state is None:
+
+        return
+
+    tracker = GiniTracker([], state["resolution"])
+
+    tracker.count = state["count"]
+
+    tracker.total = state["total"]
+
+    tracker.offset = state["offset"]
+
+    tracker.pair_sum = state["pair_sum"]
+
+    tracker.bucket_counts = arrays["gini_bucket_counts"].tolist()
+
+    tracker.bucket_sums = arrays["gini_bucket_sums"].tolist()
+
+    tracker.counts = FenwickTree([])
+
+    tracker.counts.size = len(tracker.bucket_counts)
+
+    tracker.counts.tree = arrays["gini_count_tree"].tolist()
+
+    tracker.sums = FenwickTree([])
+
+    tracker.sums.size = len(tracker.bucket_sums)
+
+    tracker.sums.tree = arrays["gini_sum_tree"].tolist()
+
+    model.gini_tracker = tracker
+
+
+def load_array_engine(engine, arrays, meta):
+
+    for name in ("x", "y", "wealth", "strategy", "transactions", "holdings"):
+
+        setattr(engine, name, arrays["engine_" + name].copy())
+
+    engine.time = meta["engine_time"]
+
+    engine.rng.bit_generator.state = meta["engine_rng"]
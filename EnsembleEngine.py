@@ -0,0 +1,105 @@
+import numpy as np
+from ArrayEngine import ArrayEngine, MOORE_OFFSETS
+from TradeNetwork import TradeNetwork
+from Strategies import lookup_strategy, strategy_counts
+
+
+def stack_networks(networks):
+
+    """Return one TradeNetwork with the given networks side by side, without edges between them."""
+
+    offsets = np.cumsum([0] + [network.number_of_nodes() for network in networks])
+
+    edge_offsets = np.cumsum([0] + [len(network.indices) for network in networks])
+
+    indptr = np.concatenate([[0]] + [network.indptr[1:] + edge_offset for network, edge_offset in zip(networks, edge_offsets)])
+
+    indices = np.concatenate([network.indices + offset for network, offset in zip(networks, offsets)]).astype(np.int32)
+
+    return TradeNetwork(indptr, indices)
+
+
+class EnsembleEngine(ArrayEngine):
+
+    """Independent replicas of one ArrayEngine population, stepped as a single batch.
+
+    The agents of replica r are the ids r * number_of_agents to (r + 1) *
+    number_of_agents - 1, and every replica has its own band of width
+    columns in a grid of replicas * width columns, which its agents never
+    leave. So every phase still runs once over all the agents, no trade ever
+    crosses two replicas, and replica_view() gives the per-agent arrays a
+    leading replica dimension. The replicas share the market.
+    """
+
+    def __init__(self, replicas, number_of_agents, width, height, strategy, wealth=1, market=None,
+                 unique_cells=True, mean_reversion_threshold=1.0, seed=None, networks=None):
+
+        network = stack_networks(networks) if networks is not None else None
+
+        super().__init__(replicas * number_of_agents, replicas * width, height, strategy, wealth=wealth, market=market,
+                         unique_cells=False, mean_reversion_threshold=mean_reversion_threshold, seed=seed, network=network)
+
+        self.replicas = replicas
+
+        self.agents_per_replica = number_of_agents
+
+        self.replica_width = width
+
+        # Every replica splits its agents over the strategies as a single population would.
+        counts = strategy_counts(strategy, number_of_agents)
+
+        self.strategy = np.tile(np.repeat(np.array([lookup_strategy(name).id for name, _ in counts], dtype=np.int8),
+                                          [count for _, count in counts]), replicas)
+
+        # Place every replica's agents in its own band, one per cell if asked to.
+        number_of_cells = width * height
+
+        if unique_cells:
+
+            cells = np.concatenate([self.rng.choice(number_of_cells, number_of_agents, replace=False) for _ in range(replicas)])
+
+        else:
+
+            cells = self.rng.integers(0, number_of_cells, replicas * number_of_agents)
+
+        self.band = np.repeat(np.arange(replicas) * width, number_of_agents)
+
+        self.x = self.band + cells // height
+
+        self.y = cells % height
+
+    def move(self):
+
+        """Move every agent to a random cell of its Moore neighbourhood, wrapping around within its replica's band."""
+
+        offsets = MOORE_OFFSETS[self.rng.integers(0, len(MOORE_OFFSETS), self.num_agents)]
+
+        self.x = self.band + (self.x - self.band + offsets[:, 0]) % self.replica_width
+
+        self.y = (self.y + offsets[:, 1]) % self.height
+
+    def replica_view(self, values):
+
+        """Return a per-agent array as replicas x agents."""
+
+        return values.reshape(self.replicas, self.agents_per_replica)
+
+    def replica_gini(self):
+
+        """Compute the Gini coefficient of every replica."""
+
+        x = np.sort(self.replica_view(self.wealth), axis=1)
+
+        N = self.agents_per_replica
+
+        B = np.sum(x * (N - np.arange(N)), axis=1) / (N * np.sum(x, axis=1))
+
+        return 1 + (1 / N) - 2 * B
+
+    def replica_wealthiest(self):
+
+        return self.replica_view(self.wealth).max(axis=1)
+
+    def replica_wealthy(self):
+
+        return np.count_nonzero(self.replica_view(self.wealth) > 0, axis=1)
@@ -0,0 +1,123 @@
+from mesa import Model
+from mesa.time import BaseScheduler
+from mesa.space import MultiGrid
+import numpy as np
+from EnsembleEngine import EnsembleEngine
+from Market import Market
+from MetricsCollector import MetricsCollector
+from TradeNetwork import make_network
+
+# The metrics reported across the replicas, by the EnsembleEngine method that computes them per replica.
+ENSEMBLE_METRICS = {
+    "Gini": "replica_gini",
+    "Wealthiest Agent": "replica_wealthiest",
+    "Wealthy Agents": "replica_wealthy",
+}
+
+
+class EnsembleModel(Model):
+
+    """A Monte Carlo ensemble of independent FinancialModel array engine runs.
+
+    All replicas are advanced together by one EnsembleEngine, and every step
+    reports the mean and the percentiles of the Gini coefficient, the
+    wealthiest agent and the number of wealthy agents over the replicas,
+    as "<metric> Mean" and "<metric> P<percentile>".
+    """
+
+    def __init__(self, number_of_agents, width, height, strategy, replicas=100, seed=None, topology="grid", percentiles=(5, 50, 95)):
+
+        # Keep the seed. Mesa's Model.__new__ has already used it to seed self.random.
+        self.seed = seed
+
+        # Every replica has the same number of agents, at most one per cell.
+        self.num_agents = min(number_of_agents, width * height)
+
+        self.replicas = replicas
+
+        self.strategy = strategy
+
+        self.topology = topology
+
+        self.percentiles = percentiles
+
+        # The grid of a single replica, for its size.
+        self.grid = MultiGrid(width, height, True)
+
+        # The replicas share the market, so they see the same prices.
+        self.market = Market([("Gold", 1), ("Silver", 0.5)])
+
+        # The schedule has no agents and only keeps track of time.
+        self.schedule = BaseScheduler(self)
+
+        self.running = True
+
+        # Give every replica its own trade network, unless they trade on the grid.
+        networks = None
+
+        if topology != "grid":
+
+            networks = [make_network(topology, self.num_agents, seed=self.random.getrandbits(64)) for _ in range(replicas)]
+
+        self.array_engine = EnsembleEngine(
+            replicas,
+            self.num_agents,
+            width,
+            height,
+            strategy,
+            wealth=1,
+            market=self.market,
+            unique_cells=True,
+            seed=self.random.getrandbits(64),
+            networks=networks,
+        )
+
+        # The per-replica values of every metric at the current step.
+        self.replica_values = {}
+
+        model_reporters = {}
+
+        for metric in ENSEMBLE_METRICS:
+
+            model_reporters[metric + " Mean"] = lambda model, metric=metric: float(model.replica_values[metric].mean())
+
+            for percentile in percentiles:
+
+                model_reporters[metric + " P" + str(percentile)] = lambda model, metric=metric, percentile=percentile: float(np.percentile(model.replica_values[metric], percentile))
+
+        self.metrics = MetricsCollector(model_reporters=model_reporters)
+
+        # The charts look the collector up by these names.
+        self.datacollector_gini = self.metrics
+
+        self.datacollector_wealthiest_agent = self.metrics
+
+        self.datacollector_currents = self.metrics
+
+    def step(self):
+
+        """Advance every replica by one step."""
+
+        # Increase the price of every asset by 0.1 every 10 steps, as in FinancialModel.
+        if self.schedule.time % 10 == 0:
+
+            self.market.tick(0.1)
+
+        self.array_engine.step()
+
+        self.schedule.step()
+
+        # Compute every metric once per replica, for all of its reporters.
+        for metric, method in ENSEMBLE_METRICS.items():
+
+            self.replica_values[metric] = getattr(self.array_engine, method)()
+
+        self.metrics.collect(self)
+
+    def get_bands(self, metric):
+
+        """Return the mean and the percentile series of a metric, one value per step, by column name."""
+
+        columns = [metric + " Mean"] + [metric + " P" + str(percentile) for percentile in self.percentiles]
+
+        return {column: np.array(self.metrics.model_vars[column]) for column in columns}
@@ -1,6 +1,7 @@
 from mesa import Agent
 import random
-from Asset import Asset
+from time import perf_counter
+from Strategies import STRATEGIES, lookup_strategy
 
 class FinancialAgent(Agent):
 
@@ -20,37 +21,87 @@ class FinancialAgent(Agent):
         # Set the agent's mood.
         self.mood = mood
 
-        # Create an empty list for activities history
-        self.history = []  
-
         # Define an empty list for the agent's assets.
         self.assets = []
 
-        # Add gold to the agent's assets.
-        self.assets.append(Asset("Gold", 1, 1))
+        # Add a unit of every asset on the market. The Asset instances are shared with the other agents.
+        for name in self.model.market.get_asset_names():
+
+            self.assets.append(self.model.market.issue(name))
+
+        # Set the mean reversion threshold, in rolling standard deviations of the price
+        self.mean_reversion_threshold = 1.0
+
+    @property
+    def strategy(self):
+
+        return self._strategy
+
+    @strategy.setter
+    def strategy(self, strategy):
+
+        # Look the strategy up once, so trading needs no dispatch on its name.
+        self.trade_strategy = lookup_strategy(strategy)
+
+        self._strategy = strategy
 
-        # Add silver to the agent's assets.
-        self.assets.append(Asset("Silver", 0.5, 1))
+    @property
+    def wealth(self):
 
-        # Set the mean reversion threshold
-        self.mean_reversion_threshold = 0.2
+        return self._wealth
+
+    @wealth.setter
+    def wealth(self, wealth):
+
+        # Let the model's Gini tracker know about the change.
+        gini_tracker = getattr(self.model, "gini_tracker", None)
+
+        if gini_tracker is not None and hasattr(self, "_wealth"):
+
+            gini_tracker.update(self._wealth, wealth)
+
+        self._wealth = wealth
 
     def step(self):
 
-        """A model step. Move, then trade with neighbors."""
+        """A model step. Move, then trade with neighbors, or quote to the model's order book."""
+
+        # Time the phases when the model's timer is on.
+        timer = self.model.phase_timer
+
+        if timer.enabled:
+
+            started = perf_counter()
+
+            self.move()
+
+            moved = perf_counter()
+
+            timer.add("move", moved - started)
+
+            if self.quotes():
+
+                self.quote()
+
+                timer.add("trade", perf_counter() - moved)
+
+            elif self.wealth > 0:
+
+                self.trade()
+
+                timer.add("trade", perf_counter() - moved)
+
+            return
         
         self.move()
 
-        if self.wealth > 0:
+        if self.quotes():
 
-            self.trade()            
+            self.quote()
 
-        # Increase the price of gold and silver by 0.1 every 10 steps.
-        if self.model.schedule.time % 10 == 0:
-            
-            for asset in self.assets:
-    
-                asset.price += 0.1
+        elif self.wealth > 0:
+
+            self.trade()            
 
     
     def move(self):
@@ -73,160 +124,77 @@ class FinancialAgent(Agent):
         # Move the agent to the new position.
         self.model.grid.move_agent(self, new_pos)
 
-        # Add the activity to the agent's history.
-        self.history.append({'time': self.model.schedule.time,
-                              'activity': 'move',
-                              'old_pos': old_pos,
-                              'new_pos': new_pos})
+        # Add the activity to the model's activity log.
+        self.model.activity_log.append_move(self.model.schedule.time, self.unique_id, old_pos, new_pos)
 
     def trade(self):
 
-        """Trade with a random agent in the same cell."""
+        """Trade with a random agent in the same cell, or a random neighbour in the model's trade network."""
 
-        # Get the agents in the same cell.
-        cellmates = self.model.grid.get_cell_list_contents([self.pos])
+        # Choose a random partner, straight from the grid's cell list or the network's adjacency.
+        other = self.model.choose_partner(self)
 
-        # If there is more than one agent in the cell, trade with one of them.
-        if len(cellmates) > 1:
-            
-            # Choose a random agent to trade with.
-            other = self.random.choice(cellmates)
+        # If there is a partner, trade with it.
+        if other is not None:
 
-            # Keep choosing until the other agent is not the same as the current agent
-            while (other.unique_id == self.unique_id):
+            timer = self.model.phase_timer
 
-                other = self.random.choice(cellmates)
+            if timer.enabled:
 
-            if self.get_strategy() == "Asset Trading":
-                    
-                self.asset_trade(other)
-            
-            elif self.get_strategy() == "Wealth Trading":
-                    
-                self.wealth_trade(other)
+                started = perf_counter()
 
-            elif self.get_strategy() == "Mean Reversion":
+            self.trade_strategy.trade(self, other)
 
-                self.mean_reversion(other)
-            
-            elif self.get_strategy() == "Momentum":
+            if timer.enabled:
 
-                self.momentum_trade(other)
+                timer.add("strategy: " + self.get_strategy(), perf_counter() - started)
 
-            # Add the activity to the agent's history.
-            self.history.append({'time': self.model.schedule.time,
-                                    'activity': 'trade',
-                                    'other': other.unique_id,
-                                    'wealth': self.wealth,
-                                    'other_wealth': other.wealth})
+            # Add the activity to the model's activity log.
+            self.model.activity_log.append_trade(self.model.schedule.time, self.unique_id, other.unique_id, self.wealth, other.wealth)
 
-    def asset_trade(self, other):
+    def quotes(self):
 
-        # Check if the other agent has any assets.
-        if len(other.assets) > 0:
+        """Whether the agent places orders in the model's order book instead of trading with a cellmate."""
 
-            # Choose a random asset to trade.
-            asset_to_trade = self.random.choice(other.assets)
+        return self.model.order_book is not None and self.trade_strategy.quotes
 
-            # Print the asset to trade.
-            print("Agent " + str(self.unique_id) + " is interested in trading for " + str(asset_to_trade.get_name()) + " with Agent " + str(other.unique_id) + ".")
+    def quote(self):
 
-            # Get the price of the asset.
-            asset_price = asset_to_trade.get_price()
+        """Place this step's order, if the strategy makes one, in the model's order book."""
 
-            # If the agent has enough wealth to trade for the asset, trade.
-            if self.wealth >= asset_price:
-                    
-                # Take the asset from the other agent.
-                self.assets.append(asset_to_trade)
+        timer = self.model.phase_timer
 
-                # Remove the asset from the other agent.
-                other.assets.remove(asset_to_trade)
-        
-                # Give the other agent the price of the asset.
-                other.wealth += asset_price
-        
-                # Take the price of the asset from the agent.
-                self.wealth -= asset_price
+        if timer.enabled:
 
-                # Print the trade.
-                print("Agent " + str(self.unique_id) + " traded " + str(asset_to_trade.get_name()) + " with Agent " + str(other.unique_id) + " for " + str(asset_price) + " units of wealth.")
+            started = perf_counter()
 
-    def wealth_trade(self, other):
-            
-        # Check if the other agent has any wealth.
-        if other.wealth > 0:
-    
-            # Choose a random amount of wealth to trade.
-            wealth_to_trade = self.random.randint(1, self.wealth)
-    
-            # If the agent has enough wealth to trade, trade.
-            if self.wealth >= wealth_to_trade:
-                        
-                # Give the other agent one wealth.
-                other.wealth += wealth_to_trade
-            
-                # Take the wealth from the agent.
-                self.wealth -= wealth_to_trade
-    
-                # Print the trade.
-                print("Agent " + str(self.unique_id) + " traded " + str(wealth_to_trade) + " units of wealth with Agent " + str(other.unique_id) + ".")
-    
-    def mean_reversion(self, other):
+        order = self.trade_strategy.quote(self)
 
-        """ Implements mean reversion strategy. """
-        
-        # Check if the other agent has any assets.
+        if order is not None:
 
-        if len(other.assets) > 0: 
-            
-            # Choose a random asset to trade.
-            asset_to_trade = self.random.choice(other.assets)
+            self.model.order_book.submit(self.unique_id, *order)
 
-            # Print the asset to trade.
-            print("Agent " + str(self.unique_id) + " is interested in trading for " + str(asset_to_trade.get_name()) + " with Agent " + str(other.unique_id) + ".")
+        if timer.enabled:
 
-            # Get the price of the asset.
-            asset_price = asset_to_trade.get_price()
+            timer.add("strategy: " + self.get_strategy(), perf_counter() - started)
 
-            print("Asset price: " + str(asset_price))
-
-            # Calculate the mean price of the asset.
-            mean_price = asset_to_trade.get_mean_price()
-
-            print("Mean price: " + str(mean_price))
-
-            # Calculate the difference between the asset price and the mean price.
-            price_difference = asset_price - mean_price
-
-            print("Price difference: " + str(price_difference))
-
-            # Check if the difference is greater than the mean reversion threshold.
-            if abs(price_difference) > self.mean_reversion_threshold:
-
-                # Print the wealth of the agent.
-                print("Agent " + str(self.unique_id) + " has " + str(self.wealth) + " units of wealth.")
-
-                # Print what assets the other agent has.
-                for asset in other.assets:
-
-                    print("Agent " + str(other.unique_id) + " has " + str(asset.get_name()) + ".")
+    def asset_trade(self, other):
 
+        STRATEGIES["Asset Trading"].trade(self, other)
 
-                if self.wealth >= asset_price and asset_to_trade in other.assets:
+    def wealth_trade(self, other):
 
-                        self.assets.append(asset_to_trade)
+        STRATEGIES["Wealth Trading"].trade(self, other)
 
-                        other.assets.remove(asset_to_trade)
+    def mean_reversion(self, other):
 
-                        other.wealth += asset_price
+        """ Implements mean reversion strategy. """
 
-                        self.wealth -= asset_price
+        STRATEGIES["Mean Reversion"].trade(self, other)
 
-                        print("Agent " + str(self.unique_id) + " traded " + str(asset_to_trade.get_name()) + " with Agent " + str(other.unique_id) + " for " + str(asset_price) + " units of wealth.")
-        
     def momentum_trade(self, other):
-        pass
+
+        STRATEGIES["Momentum"].trade(self, other)
 
     def add_asset(self, asset):
 
@@ -249,8 +217,10 @@ class FinancialAgent(Agent):
         return self.wealth
 
     def get_history(self):
+
+        """Return this agent's rows of the model's activity log."""
         
-        return self.history 
+        return self.model.activity_log.for_agent(self.unique_id)
     
     def get_unique_id(self):
 
@@ -2,15 +2,33 @@ from mesa import Model
 from FinancialAgent import FinancialAgent
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
-from mesa.space import NetworkGrid
+from MetricsCollector import MetricsCollector, SummaryReporter
+from ArrayEngine import ArrayEngine
+from GiniTracker import GiniTracker
+from Market import Market
+from ActivityLog import ActivityLog
+from TradeEventSink import TradeEventSink, FileTradeEventSink, DEBUG
+from PhaseTimer import PhaseTimer
+from GridPlacement import sample_free_cells, place_agents
+from Checkpoint import save_checkpoint, load_checkpoint
+from RunRecorder import RunRecorder
+from Strategies import assign_strategies, strategy_names
+from StagedActivation import StagedTradeActivation
+from OrderBook import OrderBookMarket
+from PriceProcess import make_price_process
+from TradeNetwork import make_network
+from CellIndex import choose_cellmate
+from time import perf_counter
 import numpy as np
 
 class FinancialModel(Model):
 
     """A model with some number of agents."""
 
-    def __init__(self, number_of_agents, width, height, strategy):
+    def __init__(self, number_of_agents, width, height, strategy, engine="agents", activity_log_path=None, log_trades=False, seed=None, time_phases=False, record_run=False, activation="random", workers=None, order_book=False, price_process=None, topology="grid"):
+
+        # Keep the seed. Mesa's Model.__new__ has already used it to seed self.random.
+        self.seed = seed
 
         # Set the number of agents.
         self.num_agents = number_of_agents
@@ -18,11 +36,59 @@ class FinancialModel(Model):
         # Create a MultiGrid of width x height cells.
         self.grid = MultiGrid(width, height, True)
 
-        # Set the strategy.
+        # Set the strategy, either a name or a {name: proportion} mix of strategies.
         self.strategy = strategy
 
-        # Create a schedule where agents will be activated randomly.
-        self.schedule = RandomActivation(self)
+        # Set the engine, either "agents" for FinancialAgent objects or "array" for the ArrayEngine.
+        self.engine = engine
+
+        self.array_engine = None
+
+        self.gini_tracker = None
+
+        # Create the market with one shared price series per asset.
+        self.market = Market([("Gold", 1), ("Silver", 0.5)])
+
+        # Drive the prices with a seeded price process when given one, by name or as a PriceProcess.
+        self.price_process = None
+
+        if price_process is not None:
+
+            self.price_process = make_price_process(price_process, seed=self.random.getrandbits(64))
+
+            self.price_process.start(self.market.get_prices())
+
+        # Let the quoting strategies trade through a limit order book per asset when asked to.
+        self.order_book = OrderBookMarket(self.market) if order_book else None
+
+        # Create the activity log shared by all agents, memory-mapped in activity_log_path if given.
+        self.activity_log = ActivityLog(path=activity_log_path)
+
+        # Print the trade events when asked to, otherwise record nothing.
+        self.trade_events = FileTradeEventSink(level=DEBUG) if log_trades else TradeEventSink()
+
+        # Time the phases of every step when asked to.
+        self.phase_timer = PhaseTimer(time_phases)
+
+        # Create a schedule where agents will be activated randomly, one by one, or
+        # in stages, where all agents move and then trade in at most one trade each.
+        self.activation = activation
+
+        if activation == "staged":
+
+            if engine == "array":
+
+                raise ValueError("Staged activation schedules agent objects and needs the agents engine")
+
+            self.schedule = StagedTradeActivation(self, workers)
+
+        elif activation == "random":
+
+            self.schedule = RandomActivation(self)
+
+        else:
+
+            raise ValueError("Unknown activation: " + str(activation))
         
         # Let the user know that if there are more agents than cells, the number of agents will be reduced.
         if self.num_agents > self.grid.width * self.grid.height:
@@ -31,108 +97,264 @@ class FinancialModel(Model):
 
             self.num_agents = self.grid.width * self.grid.height
 
+        # Let the agents trade with their cellmates, or with their neighbours in a generated trade network.
+        self.network = None
+
+        if topology is not None and topology != "grid":
+
+            if activation == "staged":
+
+                raise ValueError("Staged activation trades within grid cells and needs the grid topology")
+
+            self.network = make_network(topology, self.num_agents, seed=self.random.getrandbits(64))
+
+        # The topology's name, or "network" for a TradeNetwork given as it is.
+        self.topology = topology if isinstance(topology, str) else "grid" if topology is None else "network"
+
         # Create agents
-        self.create_agents(self.num_agents)
+        if self.engine == "array":
+
+            self.create_array_engine(self.num_agents)
+
+        else:
+
+            self.create_agents(self.num_agents)
+
+            # Track the Gini coefficient as the agents trade. The tracker is only exact while every price is a
+            # multiple of its resolution, so with a price process or order book limits it is computed from scratch.
+            if self.price_process is None and self.order_book is None:
+
+                self.gini_tracker = GiniTracker(agent.wealth for agent in self.schedule.agents)
 
         # Initialize data collectors. 
         self.initalize_data_collectors()
 
+        # Record the run for replay when asked to.
+        self.recorder = RunRecorder(self) if record_run else None
+
     def step(self):
 
         """Advance the model by one step."""
 
+        timer = self.phase_timer
+
+        if timer.enabled:
+
+            timer.begin_step()
+
+            started = perf_counter()
+
+        # Move the prices along the price process, or else increase the price of every asset by 0.1 every 10 steps.
+        if self.price_process is not None:
+
+            self.market.update_prices(self.price_process.next())
+
+        elif self.schedule.time % 10 == 0:
+
+            self.market.tick(0.1)
+
+        if self.array_engine is not None:
+
+            self.array_engine.step(timer)
+
+        # With the array engine the schedule is empty and only keeps track of time.
         self.schedule.step()
 
-        self.collect_data()
+        # Settle the orders the agents placed during the step. The array engine settles its own.
+        if self.order_book is not None and self.array_engine is None:
+
+            self.order_book.settle_agents(self)
+
+        if timer.enabled:
+
+            # The collect time of this step is reported with the next one, as it is only known after collecting.
+            collecting = perf_counter()
+
+            timer.add("step", collecting - started)
+
+            self.collect_data()
+
+            timer.add("collect", perf_counter() - collecting)
+
+        else:
+
+            self.collect_data()
+
+        self.trade_events.flush()
+
+        self.activity_log.commit()
+
+        if self.recorder is not None:
+
+            self.recorder.record(self)
+
+    def save_checkpoint(self, path):
+
+        """Write the full state of the model to a compressed file."""
+
+        save_checkpoint(self, path)
+
+    @classmethod
+    def restore_checkpoint(cls, path):
+
+        """Create a model that continues exactly where a saved one stopped."""
+
+        return load_checkpoint(cls, path)
+
+    def set_trade_events(self, trade_events):
+
+        """Replace the trade event sink, for example to switch logging on or off."""
+
+        self.trade_events.close()
+
+        self.trade_events = trade_events
 
     def create_agents(self, number_of_agents):
-            
-            # Create agents
-            for i in range(self.num_agents):
-    
-                # Create agent object.
-                a = FinancialAgent(i, self, 1, self.strategy, 1)
-    
-                # Add the agent to the schedule.
-                self.schedule.add(a)
-                
-                # Add the agent to a random grid cell
-                x = self.random.randrange(self.grid.width)
-    
-                y = self.random.randrange(self.grid.height)
-                
-                # If the cell is not empty, try again.
-                while not self.grid.is_cell_empty((x, y)):
-    
-                    x = self.random.randrange(self.grid.width)
-    
-                    y = self.random.randrange(self.grid.height)
-    
-                # Place the agent in the cell.
-                self.grid.place_agent(a, (x, y))
+
+        # Create agents and add them to the schedule, the agents of each strategy next to each other.
+        strategies = assign_strategies(self.strategy, number_of_agents)
+
+        agents = [FinancialAgent(i, self, 1, strategies[i], 1) for i in range(number_of_agents)]
+
+        for a in agents:
+
+            self.schedule.add(a)
+
+        # Give every agent its own empty cell, sampled without replacement.
+        cells = sample_free_cells(self.grid, self.random, number_of_agents)
+
+        # Place the agents in their cells.
+        place_agents(self.grid, agents, cells)
+
+        # The agents by unique id, which is their node in the trade network.
+        self.agents_by_id = agents
+
+    def choose_partner(self, agent):
+
+        """Return a random trading partner for the agent, or None if it has none."""
+
+        if self.network is None:
+
+            return choose_cellmate(self.grid, agent, agent.random)
+
+        neighbour = self.network.random_neighbour(agent.unique_id, agent.random)
+
+        return None if neighbour is None else self.agents_by_id[neighbour]
+
+    def create_array_engine(self, number_of_agents):
+
+        """Keep the agents in NumPy arrays instead of FinancialAgent objects."""
+
+        self.array_engine = ArrayEngine(
+            number_of_agents,
+            self.grid.width,
+            self.grid.height,
+            self.strategy,
+            wealth=1,
+            market=self.market,
+            unique_cells=True,
+            seed=self.random.getrandbits(64),
+            order_book=self.order_book,
+            network=self.network,
+        )
     
     def compute_gini(model):
 
         """Compute the Gini coefficient of the model."""
 
-        # Get the wealth of each agent in the model.
-        agent_wealths = [agent.wealth for agent in model.schedule.agents]
+        if model.array_engine is not None:
+
+            return model.array_engine.compute_gini()
+
+        # The tracker is updated on every wealth change, so there is nothing to sort here.
+        if model.gini_tracker is not None:
+
+            return model.gini_tracker.gini()
 
-        # Sort the wealths.
-        x = sorted(agent_wealths)
+        x = np.sort([agent.wealth for agent in model.schedule.agents])
 
-        # Find the number of agents.
-        N = model.num_agents
+        N = len(x)
 
-        # Find the index of the median.
-        B = sum(xi * (N - i) for i, xi in enumerate(x)) / (N * sum(x))
+        B = np.sum(x * (N - np.arange(N))) / (N * np.sum(x))
 
-        # Return the Gini coefficient.
-        return (1 + (1 / N) - 2 * B)
+        return float(1 + (1 / N) - 2 * B)
 
     def get_wealthiest_agent(self):
 
+        if self.array_engine is not None:
+
+            return self.array_engine.get_wealthiest_agent()
+
         return max([agent.wealth for agent in self.schedule.agents])
 
     def compute_avg_wealth(self):
 
+        if self.array_engine is not None:
+
+            return self.array_engine.compute_avg_wealth()
+
         return np.mean([agent.wealth for agent in self.schedule.agents])
     
     @staticmethod
     def current_wealthy_agents(model) -> int:
+
+        if model.array_engine is not None:
+
+            return model.array_engine.current_wealthy_agents()
         
         return sum([1 for agent in model.schedule.agents if agent.wealth > 0])
 
     @staticmethod
     def current_non_wealthy_agents(model) -> int:
 
+        if model.array_engine is not None:
+
+            return model.array_engine.current_non_wealthy_agents()
+
         return sum([1 for agent in model.schedule.agents if agent.wealth <= 0])
 
 
     def initalize_data_collectors(self):
-    
-        self.datacollector_gini = DataCollector(
 
-            model_reporters={"Gini": self.compute_gini},
+        model_reporters = {
+            "Gini": self.compute_gini,
+            "Wealthiest Agent": SummaryReporter("wealthiest"),
+            "Wealthy Agents": SummaryReporter("wealthy"),
+            "Non Wealthy Agents": SummaryReporter("non_wealthy"),
+        }
+
+        # Report the phase timings when they are being measured.
+        if self.phase_timer.enabled:
+
+            timer = self.phase_timer
+
+            strategy_phases = ["strategy: " + name for name in strategy_names(self.strategy)]
+
+            model_reporters.update({
+                "Step Time (ms)": lambda model: timer.step_ms("step"),
+                "Move Time (ms)": lambda model: timer.step_ms("move"),
+                "Trade Time (ms)": lambda model: timer.step_ms("trade"),
+                "Strategy Time (ms)": lambda model: sum(timer.step_ms(phase) for phase in strategy_phases),
+                "Collect Time (ms)": lambda model: timer.previous_step_ms("collect"),
+                "Trade Attempts": lambda model: sum(timer.step_count(phase) for phase in strategy_phases),
+            })
+
+        # A single collector computes every metric in one pass over the agents.
+        self.metrics = MetricsCollector(
+
+            model_reporters=model_reporters,
             agent_reporters={"Wealth": "wealth"}
         )
-    
-        self.datacollector_wealthiest_agent = DataCollector(
 
-            model_reporters={"Wealthiest Agent": self.get_wealthiest_agent}
-        )
+        # The charts look the collector up by these names.
+        self.datacollector_gini = self.metrics
 
-        self.datacollector_currents = DataCollector(
-            {
-                "Wealthy Agents": self.current_wealthy_agents,
-                "Non Wealthy Agents": self.current_non_wealthy_agents,
-            }
-        )
+        self.datacollector_wealthiest_agent = self.metrics
 
-    def collect_data(self):
+        self.datacollector_currents = self.metrics
 
-        self.datacollector_gini.collect(self)
+        self.datacollector_timings = self.metrics
 
-        self.datacollector_wealthiest_agent.collect(self)
+    def collect_data(self):
 
-        self.datacollector_currents.collect(self)
+        self.metrics.collect(self)
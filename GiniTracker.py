@@ -0,0 +1,211 @@
+class FenwickTree:
+
+    """A binary indexed tree over a fixed number of slots."""
+
+    def __init__(self, values):
+
+        self.size = len(values)
+
+        self.tree = [0] + list(values)
+
+        # Build the tree in O(n) by pushing every node into its parent.
+        for i in range(1, self.size + 1):
+
+            parent = i + (i & -i)
+
+            if parent <= self.size:
+
+                self.tree[parent] += self.tree[i]
+
+    def add(self, index, delta):
+
+        """Add delta to the slot at index."""
+
+        i = index + 1
+
+        while i <= self.size:
+
+            self.tree[i] += delta
+
+            i += i & -i
+
+    def prefix_sum(self, index):
+
+        """Return the sum of the slots before index."""
+
+        total = 0
+
+        i = index
+
+        while i > 0:
+
+            total += self.tree[i]
+
+            i -= i & -i
+
+        return total
+
+
+class GiniTracker:
+
+    """Keeps the Gini coefficient of a changing set of wealth values up to date.
+
+    Values are bucketed at the given resolution, and two Fenwick trees hold the
+    count and the sum of the values in every bucket. The tracker maintains the
+    sum of absolute differences over all pairs of values, so that every wealth
+    change costs O(log M) for M buckets and reading the Gini coefficient is O(1).
+    Values that fall in the same bucket are assumed to be equal, which is exact
+    as long as the resolution divides every price and wealth amount. Prices
+    from a price process or an order book do not, so FinancialModel only
+    keeps a tracker when it has neither.
+    """
+
+    def __init__(self, values, resolution=0.01):
+
+        values = list(values)
+
+        self.resolution = resolution
+
+        self.count = len(values)
+
+        self.total = sum(values)
+
+        # Size the buckets to the initial values, leaving room on both sides.
+        keys = [self.key(value) for value in values] or [0]
+
+        padding = max(16, max(keys) - min(keys))
+
+        self.offset = min(keys) - padding
+
+        self.bucket_counts = [0] * (max(keys) - min(keys) + 2 * padding + 1)
+
+        self.bucket_sums = [0] * len(self.bucket_counts)
+
+        for key, value in zip(keys, values):
+
+            self.bucket_counts[key - self.offset] += 1
+
+            self.bucket_sums[key - self.offset] += value
+
+        self.build_trees()
+
+        # Sum of |x_i - x_j| over all pairs, from the sorted values.
+        x = sorted(values)
+
+        self.pair_sum = sum(xi * (2 * i - self.count + 1) for i, xi in enumerate(x))
+
+    def key(self, value):
+
+        return round(value / self.resolution)
+
+    def build_trees(self):
+
+        self.counts = FenwickTree(self.bucket_counts)
+
+        self.sums = FenwickTree(self.bucket_sums)
+
+    def index(self, value):
+
+        """Return the bucket of value, growing the buckets if it falls outside them."""
+
+        index = self.key(value) - self.offset
+
+        if index < 0:
+
+            extra = max(len(self.bucket_counts), -index)
+
+            self.bucket_counts = [0] * extra + self.bucket_counts
+
+            self.bucket_sums = [0] * extra + self.bucket_sums
+
+            self.offset -= extra
+
+            index += extra
+
+            self.build_trees()
+
+        elif index >= len(self.bucket_counts):
+
+            extra = max(len(self.bucket_counts), index - len(self.bucket_counts) + 1)
+
+            self.bucket_counts = self.bucket_counts + [0] * extra
+
+            self.bucket_sums = self.bucket_sums + [0] * extra
+
+            self.build_trees()
+
+        return index
+
+    def distance_sum(self, value, index):
+
+        """Return the sum of |value - x| over every tracked value x."""
+
+        count_below = self.counts.prefix_sum(index)
+
+        sum_below = self.sums.prefix_sum(index)
+
+        count_same = self.bucket_counts[index]
+
+        sum_same = self.bucket_sums[index]
+
+        count_above = self.count - count_below - count_same
+
+        sum_above = self.total - sum_below - sum_same
+
+        return (value * count_below - sum_below) + (sum_above - value * count_above) + abs(value * count_same - sum_same)
+
+    def add(self, value):
+
+        """Start tracking a new value."""
+
+        index = self.index(value)
+
+        self.pair_sum += self.distance_sum(value, index)
+
+        self.counts.add(index, 1)
+
+        self.sums.add(index, value)
+
+        self.bucket_counts[index] += 1
+
+        self.bucket_sums[index] += value
+
+        self.count += 1
+
+        self.total += value
+
+    def remove(self, value):
+
+        """Stop tracking a value."""
+
+        index = self.index(value)
+
+        self.counts.add(index, -1)
+
+        self.sums.add(index, -value)
+
+        self.bucket_counts[index] -= 1
+
+        self.bucket_sums[index] -= value
+
+        self.count -= 1
+
+        self.total -= value
+
+        self.pair_sum -= self.distance_sum(value, index)
+
+    def update(self, old_value, new_value):
+
+        """Replace a tracked value with a new one."""
+
+        if old_value != new_value:
+
+            self.remove(old_value)
+
+            self.add(new_value)
+
+    def gini(self):
+
+        """Return the Gini coefficient of the tracked values."""
+
+        return self.pair_sum / (self.count * self.total)
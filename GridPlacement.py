@@ -0,0 +1,32 @@
+def sample_free_cells(grid, rng, number_of_cells):
+
+    """Return distinct empty cells of the grid, chosen uniformly without replacement.
+
+    Sampling a whole empty grid works on cell indices, so it is O(number_of_cells)
+    at any density. A grid that already holds agents samples from its empty cells.
+    """
+
+    if len(grid.empties) == grid.width * grid.height:
+
+        indices = rng.sample(range(grid.width * grid.height), number_of_cells)
+
+        return [(index // grid.height, index % grid.height) for index in indices]
+
+    return rng.sample(sorted(grid.empties), number_of_cells)
+
+
+def place_agents(grid, agents, positions):
+
+    """Put the agents on a MultiGrid in one go, without the checks of grid.place_agent."""
+
+    cells = grid.grid
+
+    for agent, pos in zip(agents, positions):
+
+        x, y = pos
+
+        cells[x][y].append(agent)
+
+        agent.pos = pos
+
+    grid.empties.difference_update(positions)
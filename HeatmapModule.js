@@ -0,0 +1,75 @@
+// Draws the frames of a HeatmapModule: one canvas shaded by the number of
+// agents per tile, and one coloured from red to green by their mean wealth.
+// Every tile is one pixel of an offscreen image, scaled up to the canvas.
+const HeatmapModule = function (tiles_x, tiles_y, canvas_width, canvas_height) {
+  const parent = document.createElement("div");
+  document.getElementById("elements").appendChild(parent);
+
+  const createPanel = (title) => {
+    const panel = document.createElement("div");
+    panel.style.display = "inline-block";
+    panel.style.marginRight = "10px";
+    const label = document.createElement("div");
+    label.innerText = title;
+    const canvas = document.createElement("canvas");
+    Object.assign(canvas, { width: canvas_width, height: canvas_height });
+    canvas.style.border = "1px dotted";
+    panel.appendChild(label);
+    panel.appendChild(canvas);
+    parent.appendChild(panel);
+    const context = canvas.getContext("2d");
+    context.imageSmoothingEnabled = false;
+    return context;
+  };
+
+  const densityContext = createPanel("Agents per tile");
+  const wealthContext = createPanel("Mean wealth per tile");
+
+  const image = document.createElement("canvas");
+  Object.assign(image, { width: tiles_x, height: tiles_y });
+  const imageContext = image.getContext("2d");
+
+  const decode = (text, Type) => {
+    const bytes = Uint8Array.from(atob(text), (c) => c.charCodeAt(0));
+    return new Type(bytes.buffer);
+  };
+
+  // Draws one value per tile, with y = 0 at the bottom as in CanvasGrid.
+  const draw = (context, color) => {
+    const pixels = imageContext.createImageData(tiles_x, tiles_y);
+    for (let x = 0; x < tiles_x; x++) {
+      for (let y = 0; y < tiles_y; y++) {
+        const [r, g, b, a] = color(x * tiles_y + y);
+        const offset = ((tiles_y - 1 - y) * tiles_x + x) * 4;
+        pixels.data[offset] = r;
+        pixels.data[offset + 1] = g;
+        pixels.data[offset + 2] = b;
+        pixels.data[offset + 3] = a;
+      }
+    }
+    imageContext.putImageData(pixels, 0, 0);
+    context.clearRect(0, 0, canvas_width, canvas_height);
+    context.drawImage(image, 0, 0, canvas_width, canvas_height);
+  };
+
+  this.render = (data) => {
+    const density = decode(data.density, Uint32Array);
+    const meanWealth = decode(data.mean_wealth, Float32Array);
+    const wealthRange = data.max_wealth - data.min_wealth || 1;
+
+    draw(densityContext, (i) => {
+      const shade = data.max_density ? density[i] / data.max_density : 0;
+      return [0, 0, 255, Math.round(255 * shade)];
+    });
+    draw(wealthContext, (i) => {
+      if (density[i] === 0) return [0, 0, 0, 0];
+      const share = (meanWealth[i] - data.min_wealth) / wealthRange;
+      return [Math.round(255 * (1 - share)), Math.round(255 * share), 0, 255];
+    });
+  };
+
+  this.reset = () => {
+    densityContext.clearRect(0, 0, canvas_width, canvas_height);
+    wealthContext.clearRect(0, 0, canvas_width, canvas_height);
+  };
+};
@@ -0,0 +1,77 @@
+import base64
+import math
+import numpy as np
+from mesa.visualization.ModularVisualization import VisualizationElement
+
+
+def agent_arrays(model):
+
+    """Return the x, y and wealth of every agent as arrays, from the array engine if the model has one."""
+
+    engine = getattr(model, "array_engine", None)
+
+    if engine is not None:
+
+        return engine.x, engine.y, engine.wealth
+
+    agents = model.schedule.agents
+
+    values = np.array([(agent.pos[0], agent.pos[1], agent.wealth) for agent in agents], dtype=np.float64).reshape(len(agents), 3)
+
+    return values[:, 0].astype(np.int64), values[:, 1].astype(np.int64), values[:, 2]
+
+
+def encode(values):
+
+    # Little-endian bytes in base64, which the browser reads into a typed array.
+    return base64.b64encode(values.astype(values.dtype.newbyteorder("<")).tobytes()).decode("ascii")
+
+
+class HeatmapModule(VisualizationElement):
+
+    """Draws the grid as tiles of agent density and mean wealth instead of one circle per agent.
+
+    Every tile_size x tile_size block of cells becomes one tile. The tiles
+    are binned with NumPy, and each frame sends two arrays with one value
+    per tile, so the size of a frame depends on the grid and not on the
+    number of agents.
+    """
+
+    local_includes = ["HeatmapModule.js"]
+
+    def __init__(self, grid_width, grid_height, tile_size=1, canvas_width=500, canvas_height=500):
+
+        self.grid_width = grid_width
+
+        self.grid_height = grid_height
+
+        self.tile_size = tile_size
+
+        self.tiles_x = math.ceil(grid_width / tile_size)
+
+        self.tiles_y = math.ceil(grid_height / tile_size)
+
+        self.js_code = "elements.push(new HeatmapModule({}, {}, {}, {}));".format(
+            self.tiles_x, self.tiles_y, canvas_width, canvas_height)
+
+    def render(self, model):
+
+        x, y, wealth = agent_arrays(model)
+
+        tiles = (x // self.tile_size) * self.tiles_y + y // self.tile_size
+
+        number_of_tiles = self.tiles_x * self.tiles_y
+
+        density = np.bincount(tiles, minlength=number_of_tiles)
+
+        wealth_sums = np.bincount(tiles, weights=wealth, minlength=number_of_tiles)
+
+        mean_wealth = np.divide(wealth_sums, density, out=np.zeros(number_of_tiles), where=density > 0)
+
+        return {
+            "density": encode(density.astype(np.uint32)),
+            "mean_wealth": encode(mean_wealth.astype(np.float32)),
+            "max_density": int(density.max(initial=0)),
+            "min_wealth": float(min(mean_wealth.min(initial=0), 0)),
+            "max_wealth": float(mean_wealth.max(initial=0)),
+        }
@@ -0,0 +1,86 @@
+from mesa.visualization.modules import CanvasGrid
+
+
+def default_agent_key(agent):
+
+    return agent.pos, agent.wealth
+
+
+class IncrementalCanvasGrid(CanvasGrid):
+
+    """A CanvasGrid that only re-portrays and re-sends the agents that changed.
+
+    Every frame it compares a key per agent, by default its position and
+    wealth, with the key from the previous frame, and calls the portrayal
+    method only for agents whose key changed. The browser keeps the other
+    portrayals from earlier frames. When frame_key(model) changes, for example
+    because the wealth scaling changed, or the model was reset, the whole grid
+    is sent again. The browser state is shared, so the server is meant for one
+    page at a time.
+    """
+
+    package_includes = ["GridDraw.js", "InteractionHandler.js"]
+
+    local_includes = ["IncrementalCanvasModule.js"]
+
+    def __init__(self, portrayal_method, grid_width, grid_height, canvas_width=500, canvas_height=500,
+                 agent_key=default_agent_key, frame_key=None):
+
+        super().__init__(portrayal_method, grid_width, grid_height, canvas_width, canvas_height)
+
+        self.agent_key = agent_key
+
+        self.frame_key = frame_key
+
+        self.js_code = self.js_code.replace("new CanvasModule(", "new IncrementalCanvasModule(")
+
+        self.model = None
+
+        self.frame = None
+
+        self.keys = {}
+
+    def render(self, model):
+
+        frame = self.frame_key(model) if self.frame_key is not None else None
+
+        # Send everything again for a new model or a new frame key.
+        reset = model is not self.model or frame != self.frame
+
+        if reset:
+
+            self.model = model
+
+            self.frame = frame
+
+            self.keys = {}
+
+        changed = []
+
+        keys = {}
+
+        for agent in model.schedule.agents:
+
+            key = self.agent_key(agent)
+
+            keys[agent.unique_id] = key
+
+            if self.keys.get(agent.unique_id) == key:
+
+                continue
+
+            portrayal = self.portrayal_method(agent)
+
+            if portrayal:
+
+                portrayal["x"], portrayal["y"] = agent.pos
+
+                portrayal["id"] = agent.unique_id
+
+                changed.append(portrayal)
+
+        removed = [unique_id for unique_id in self.keys if unique_id not in keys]
+
+        self.keys = keys
+
+        return {"reset": reset, "changed": changed, "removed": removed}
@@ -0,0 +1,76 @@
+// Draws the frames of an IncrementalCanvasGrid. Every frame only carries the
+// portrayals that changed, so the portrayals of the other agents are kept here
+// between frames.
+const IncrementalCanvasModule = function (
+  canvas_width,
+  canvas_height,
+  grid_width,
+  grid_height
+) {
+  const createElement = (tagName, attrs) => {
+    const element = document.createElement(tagName);
+    Object.assign(element, attrs);
+    return element;
+  };
+
+  const parent = createElement("div", {
+    style: `height:${canvas_height}px;`,
+    className: "world-grid-parent",
+  });
+
+  const createCanvas = () =>
+    createElement("canvas", {
+      width: canvas_width,
+      height: canvas_height,
+      className: "world-grid",
+    });
+
+  const canvas = createCanvas();
+  const interaction_canvas = createCanvas();
+
+  parent.appendChild(canvas);
+  parent.appendChild(interaction_canvas);
+
+  document.getElementById("elements").appendChild(parent);
+
+  const interactionHandler = new InteractionHandler(
+    canvas_width,
+    canvas_height,
+    grid_width,
+    grid_height,
+    interaction_canvas.getContext("2d")
+  );
+  const canvasDraw = new GridVisualization(
+    canvas_width,
+    canvas_height,
+    grid_width,
+    grid_height,
+    canvas.getContext("2d"),
+    interactionHandler
+  );
+
+  // The latest portrayal of every agent, by agent id.
+  const portrayals = new Map();
+
+  this.render = (data) => {
+    if (data.reset) portrayals.clear();
+    for (const id of data.removed) portrayals.delete(id);
+    for (const portrayal of data.changed) portrayals.set(portrayal.id, portrayal);
+
+    const layers = {};
+    for (const portrayal of portrayals.values()) {
+      (layers[portrayal.Layer] = layers[portrayal.Layer] || []).push(portrayal);
+    }
+
+    canvasDraw.resetCanvas();
+    for (const layer of Object.keys(layers).sort((a, b) => a - b)) {
+      canvasDraw.drawLayer(layers[layer]);
+    }
+    canvasDraw.drawGridLines("#eee");
+  };
+
+  this.reset = () => {
+    portrayals.clear();
+    canvasDraw.resetCanvas();
+  };
+};
@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class Indicators:
+
+    """Technical indicators of one asset's price, updated in O(1) per tick.
+
+    The asset calls update() once for every new price, and every agent reads
+    the same values, so a decision costs a lookup instead of a pass over the
+    price history. The rolling mean and standard deviation cover the last
+    window prices, the exponential moving average has a span of ema_span
+    ticks, and the rate of change compares the price with the one roc_lag
+    ticks before. Until that many prices have been seen they cover all of
+    them.
+    """
+
+    def __init__(self, price, window=20, ema_span=10, roc_lag=10):
+
+        self.window = window
+
+        self.ema_span = ema_span
+
+        self.roc_lag = roc_lag
+
+        self.alpha = 2 / (ema_span + 1)
+
+        # A ring buffer of the last prices, long enough for both the window and the lag.
+        self.prices = np.empty(max(window, roc_lag + 1), dtype=np.float64)
+
+        self.head = 0
+
+        self.count = 0
+
+        self.ema = price
+
+        # The rolling mean and the sum of squared deviations from it (Welford, with removals).
+        self.mean = 0.0
+
+        self.squared_deviations = 0.0
+
+        self.update(price)
+
+    def update(self, price):
+
+        """Add a new price."""
+
+        capacity = len(self.prices)
+
+        size = min(self.count, self.window)
+
+        # The price that leaves the window, if it is full.
+        if size == self.window:
+
+            old = self.prices[(self.head - self.window) % capacity]
+
+            old_mean = self.mean
+
+            self.mean += (price - old) / self.window
+
+            self.squared_deviations += (price - old) * (price - self.mean + old - old_mean)
+
+        else:
+
+            delta = price - self.mean
+
+            self.mean += delta / (size + 1)
+
+            self.squared_deviations += delta * (price - self.mean)
+
+        self.ema += self.alpha * (price - self.ema)
+
+        self.prices[self.head] = price
+
+        self.head = (self.head + 1) % capacity
+
+        self.count += 1
+
+        # Recompute the window statistics once per lap so rounding errors cannot build up.
+        if self.head == 0 and self.count >= self.window:
+
+            recent = self.window_prices()
+
+            self.mean = float(recent.mean())
+
+            self.squared_deviations = float(((recent - self.mean) ** 2).sum())
+
+    def window_prices(self):
+
+        """Return the prices in the rolling window, oldest first."""
+
+        size = min(self.count, self.window)
+
+        return self.prices[(self.head - size + np.arange(size)) % len(self.prices)]
+
+    def price(self):
+
+        return self.prices[self.head - 1]
+
+    def rolling_mean(self):
+
+        return self.mean
+
+    def rolling_std(self):
+
+        # Rounding can leave a tiny negative sum for a flat window.
+        return (max(self.squared_deviations, 0.0) / min(self.count, self.window)) ** 0.5
+
+    def exponential_moving_average(self):
+
+        return self.ema
+
+    def rate_of_change(self):
+
+        """Return the relative change of the price over the last roc_lag ticks."""
+
+        lag = min(self.count - 1, self.roc_lag)
+
+        return self.price() / self.prices[(self.head - 1 - lag) % len(self.prices)] - 1
+
+    def z_score(self):
+
+        """Return how many rolling standard deviations the price is from the rolling mean."""
+
+        std = self.rolling_std()
+
+        return (self.price() - self.mean) / std if std > 0 else 0.0
+
+    def get_state(self):
+
+        return {"head": self.head, "count": self.count, "ema": self.ema, "mean": self.mean,
+                "squared_deviations": self.squared_deviations}
+
+    def set_state(self, prices, state):
+
+        self.prices = prices
+
+        for name, value in state.items():
+
+            setattr(self, name, value)
@@ -0,0 +1,72 @@
+import numpy as np
+from Asset import Asset
+
+class Market:
+
+    """The model's price book, holding one shared Asset per asset type.
+
+    Agents hold references to these Asset instances rather than their own
+    copies, so every agent sees the same price for the same asset and a
+    price tick is a single update per asset type.
+    """
+
+    def __init__(self, assets):
+
+        # Create one Asset for every (name, price) pair. Its quantity counts the units in circulation.
+        self.assets = {name: Asset(name, price, 0) for name, price in assets}
+
+    def get_asset(self, name):
+
+        return self.assets[name]
+
+    def get_assets(self):
+
+        return list(self.assets.values())
+
+    def get_asset_names(self):
+
+        return list(self.assets.keys())
+
+    def issue(self, name):
+
+        """Put a new unit of the named asset into circulation and return the shared instance."""
+
+        asset = self.assets[name]
+
+        asset.set_quantity(asset.get_quantity() + 1)
+
+        return asset
+
+    def get_price(self, name):
+
+        return self.assets[name].get_price()
+
+    def get_prices(self):
+
+        return np.array([asset.get_price() for asset in self.assets.values()], dtype=np.float64)
+
+    def get_mean_prices(self):
+
+        return np.array([asset.get_mean_price() for asset in self.assets.values()], dtype=np.float64)
+
+    def get_indicators(self, name):
+
+        """Return one indicator, such as "rate_of_change", of every asset."""
+
+        return np.array([getattr(asset.indicators, name)() for asset in self.assets.values()], dtype=np.float64)
+
+    def tick(self, change):
+
+        """Move the price of every asset by the same amount."""
+
+        for asset in self.assets.values():
+
+            asset.update_price(asset.get_price() + change)
+
+    def update_prices(self, prices):
+
+        """Move every asset to its own new price, in the order of get_assets()."""
+
+        for asset, price in zip(self.assets.values(), prices):
+
+            asset.update_price(float(price))
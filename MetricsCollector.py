@@ -0,0 +1,163 @@
+from mesa.datacollection import DataCollector
+
+
+class SummaryReporter:
+
+    """A model reporter that reads one aggregate from the collector's summary."""
+
+    def __init__(self, key: str):
+
+        self.key = key
+
+
+class MetricsCollector(DataCollector):
+
+    """One DataCollector for all of the model's metrics.
+
+    Instead of every reporter walking the agents on its own, collect() makes a
+    single pass over the agents (or reads the array engine) to fill a summary
+    of the aggregates and to record the agent variables. Reporters registered
+    as a SummaryReporter read from that summary; any other reporter is called
+    as usual.
+    """
+
+    def __init__(self, model_reporters=None, agent_reporters=None, tables=None):
+
+        self.summary = {}
+
+        # The model step the summary was computed for.
+        self.summary_step = None
+
+        super().__init__(model_reporters, agent_reporters, tables)
+
+    def _new_model_reporter(self, name, reporter):
+
+        if isinstance(reporter, SummaryReporter):
+
+            key = reporter.key
+
+            reporter = lambda model: self.summary[key]
+
+        super()._new_model_reporter(name, reporter)
+
+    def collect(self, model):
+
+        """Summarise the agents in one pass, then collect every reporter."""
+
+        agent_records = self.update_summary(model, record_agents=True)
+
+        # The agent records were already taken during the pass, so only run the model reporters.
+        agent_reporters, self.agent_reporters = self.agent_reporters, {}
+
+        try:
+
+            super().collect(model)
+
+        finally:
+
+            self.agent_reporters = agent_reporters
+
+        if self.agent_reporters:
+
+            self._agent_records[model.schedule.steps] = agent_records
+
+    def current_summary(self, model):
+
+        """Return the summary of the model's current step, computing it only if it has not been yet."""
+
+        if self.summary_step != model.schedule.steps:
+
+            self.update_summary(model)
+
+        return self.summary
+
+    def update_summary(self, model, record_agents=False):
+
+        """Fill the summary for the current step, and return the agent records when asked to."""
+
+        engine = getattr(model, "array_engine", None)
+
+        self.summary_step = model.schedule.steps
+
+        if engine is None:
+
+            return self.summarise_agents(model, record_agents)
+
+        self.summary = {
+            "wealthiest": engine.get_wealthiest_agent(),
+            "wealthiest_id": int(engine.wealth.argmax()),
+            "wealthy": engine.current_wealthy_agents(),
+            "non_wealthy": engine.current_non_wealthy_agents(),
+            "total_wealth": float(engine.wealth.sum()),
+            "transactions": engine.total_transactions(),
+        }
+
+        return []
+
+    def summarise_agents(self, model, record_agents=True):
+
+        """Fill the summary and return the agent records from a single pass over the agents."""
+
+        wealthiest = None
+
+        wealthiest_id = None
+
+        wealthy = 0
+
+        non_wealthy = 0
+
+        total_wealth = 0
+
+        transactions = 0
+
+        # Agent variables can be read in the same pass when they are plain attributes.
+        attributes = [getattr(reporter, "attribute_name", None) for reporter in self.agent_reporters.values()]
+
+        fused = all(attribute is not None for attribute in attributes)
+
+        record_attributes = record_agents and fused and attributes
+
+        steps = model.schedule.steps
+
+        agent_records = []
+
+        for agent in model.schedule.agents:
+
+            wealth = agent.wealth
+
+            if wealthiest is None or wealth > wealthiest:
+
+                wealthiest = wealth
+
+                wealthiest_id = agent.unique_id
+
+            if wealth > 0:
+
+                wealthy += 1
+
+            else:
+
+                non_wealthy += 1
+
+            total_wealth += wealth
+
+            transactions += getattr(agent, "transactions", 0)
+
+            if record_attributes:
+
+                agent_records.append((steps, agent.unique_id) + tuple(getattr(agent, attribute) for attribute in attributes))
+
+        self.summary = {
+            "wealthiest": wealthiest,
+            "wealthiest_id": wealthiest_id,
+            "wealthy": wealthy,
+            "non_wealthy": non_wealthy,
+            "total_wealth": total_wealth,
+            "transactions": transactions,
+        }
+
+        if record_agents and not fused:
+
+            agent_records = list(self._record_agents(model))
+
+        return agent_records
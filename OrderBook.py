@@ -0,0 +1,343 @@
+from collections import deque
+from heapq import heappop, heappush
+from math import ceil, floor
+import numpy as np
+from TradeEventSink import INFO
+
+BUY = 1
+SELL = -1
+
+
+class LimitOrderBook:
+
+    """A price-time priority limit order book for one asset.
+
+    Prices are kept as whole ticks of tick_size, with bids rounded down and
+    asks rounded up, so no order trades beyond its limit. Every price level is a
+    queue of resting orders in arrival order, and the best bid and ask levels
+    are found through heaps of the levels. A new order first trades against
+    the best opposite levels it crosses, at their prices, and what is left
+    rests in the book. Fills are appended to flat lists and taken in bulk
+    with take_fills().
+
+    An order is a list [order_id, owner, remaining], and cancelling one only
+    sets its remaining quantity to zero, so it is skipped when it reaches the
+    front of its level.
+    """
+
+    def __init__(self, tick_size=0.01):
+
+        self.tick_size = tick_size
+
+        # Resting orders by price tick, and heaps of the ticks: bids negated, for the highest first.
+        self.bids = {}
+
+        self.asks = {}
+
+        self.bid_ticks = []
+
+        self.ask_ticks = []
+
+        self.orders = {}
+
+        self.next_id = 0
+
+        self.last_tick = None
+
+        # The fills since the last take_fills().
+        self.fill_buyers = []
+
+        self.fill_sellers = []
+
+        self.fill_ticks = []
+
+        self.fill_quantities = []
+
+    def submit(self, owner, side, price, quantity=1):
+
+        """Match a limit order against the book, rest what is left, and return the order id."""
+
+        order_id = self.next_id
+
+        self.next_id += 1
+
+        # Round the limit to a tick the order is still willing to trade at.
+        tick = floor(price / self.tick_size + 1e-9) if side == BUY else ceil(price / self.tick_size - 1e-9)
+
+        remaining = quantity
+
+        if side == BUY:
+
+            levels, heap, sign = self.asks, self.ask_ticks, 1
+
+        else:
+
+            levels, heap, sign = self.bids, self.bid_ticks, -1
+
+        # Trade against the best opposite levels for as long as they cross the limit.
+        while remaining and heap and heap[0] <= sign * tick:
+
+            level_tick = sign * heap[0]
+
+            level = levels.get(level_tick)
+
+            if not level:
+
+                heappop(heap)
+
+                levels.pop(level_tick, None)
+
+                continue
+
+            resting = level[0]
+
+            if resting[2] == 0:
+
+                level.popleft()
+
+                continue
+
+            traded = min(remaining, resting[2])
+
+            resting[2] -= traded
+
+            remaining -= traded
+
+            if resting[2] == 0:
+
+                level.popleft()
+
+                del self.orders[resting[0]]
+
+            if side == BUY:
+
+                self.fill_buyers.append(owner)
+
+                self.fill_sellers.append(resting[1])
+
+            else:
+
+                self.fill_buyers.append(resting[1])
+
+                self.fill_sellers.append(owner)
+
+            self.fill_ticks.append(level_tick)
+
+            self.fill_quantities.append(traded)
+
+            self.last_tick = level_tick
+
+        if remaining:
+
+            order = [order_id, owner, remaining]
+
+            own_levels, own_heap = (self.bids, self.bid_ticks) if side == BUY else (self.asks, self.ask_ticks)
+
+            level = own_levels.get(tick)
+
+            if level is None:
+
+                level = own_levels[tick] = deque()
+
+                heappush(own_heap, -tick if side == BUY else tick)
+
+            level.append(order)
+
+            self.orders[order_id] = order
+
+        return order_id
+
+    def cancel(self, order_id):
+
+        order = self.orders.pop(order_id, None)
+
+        if order is not None:
+
+            order[2] = 0
+
+    def best_bid(self):
+
+        return self.best(self.bids, self.bid_ticks, -1)
+
+    def best_ask(self):
+
+        return self.best(self.asks, self.ask_ticks, 1)
+
+    def best(self, levels, heap, sign):
+
+        # Drop the levels at the top that have emptied.
+        while heap:
+
+            level = levels.get(sign * heap[0])
+
+            while level and level[0][2] == 0:
+
+                level.popleft()
+
+            if level:
+
+                return sign * heap[0] * self.tick_size
+
+            levels.pop(sign * heappop(heap), None)
+
+        return None
+
+    def last_price(self):
+
+        return None if self.last_tick is None else self.last_tick * self.tick_size
+
+    def take_fills(self):
+
+        """Return the fills since the last call as arrays of buyers, sellers, prices and quantities."""
+
+        fills = (
+            np.array(self.fill_buyers, dtype=np.int64),
+            np.array(self.fill_sellers, dtype=np.int64),
+            np.array(self.fill_ticks, dtype=np.int64) * self.tick_size,
+            np.array(self.fill_quantities, dtype=np.int64),
+        )
+
+        self.fill_buyers, self.fill_sellers, self.fill_ticks, self.fill_quantities = [], [], [], []
+
+        return fills
+
+    def clear(self):
+
+        """Remove every resting order."""
+
+        self.bids.clear()
+
+        self.asks.clear()
+
+        self.bid_ticks.clear()
+
+        self.ask_ticks.clear()
+
+        self.orders.clear()
+
+    def __len__(self):
+
+        return len(self.orders)
+
+
+class OrderBookMarket:
+
+    """A limit order book for every asset of a Market.
+
+    Orders are day orders: the agents submit them during a step, the fills
+    are settled at the end of the step, and the books are then cleared. Every
+    asset that traded moves to the price of its last fill.
+    """
+
+    def __init__(self, market, tick_size=0.01):
+
+        self.market = market
+
+        self.books = {name: LimitOrderBook(tick_size) for name in market.get_asset_names()}
+
+        # The number of orders and fills of the current step, and of the last settled one.
+        self.orders = 0
+
+        self.fills = 0
+
+        self.last_orders = 0
+
+        self.last_fills = 0
+
+    def submit(self, owner, asset, side, price, quantity=1):
+
+        """Submit an order for one unit of a named asset."""
+
+        self.orders += 1
+
+        return self.books[asset].submit(owner, side, price, quantity)
+
+    def submit_batch(self, owners, assets, sides, prices):
+
+        """Submit one single-unit order per row, in row order, where assets are indices into the market."""
+
+        books = list(self.books.values())
+
+        self.orders += len(owners)
+
+        for owner, asset, side, price in zip(owners.tolist(), assets.tolist(), sides.tolist(), prices.tolist()):
+
+            books[asset].submit(owner, side, price)
+
+    def settle_agents(self, model):
+
+        """Hand over the assets and wealth of the fills between FinancialAgent objects."""
+
+        agents = {agent.unique_id: agent for agent in model.schedule.agents}
+
+        events = model.trade_events
+
+        for name, book in self.books.items():
+
+            asset = self.market.get_asset(name)
+
+            for buyer_id, seller_id, price, quantity in zip(*(fills.tolist() for fills in book.take_fills())):
+
+                buyer, seller = agents[buyer_id], agents[seller_id]
+
+                for _ in range(quantity):
+
+                    buyer.assets.append(asset)
+
+                    seller.assets.remove(asset)
+
+                buyer.wealth -= price * quantity
+
+                seller.wealth += price * quantity
+
+                self.fills += 1
+
+                if events.level <= INFO:
+
+                    events.emit(INFO, "book_trade", buyer_id, seller_id, name, price)
+
+                model.activity_log.append_trade(model.schedule.time, buyer_id, seller_id, buyer.wealth, seller.wealth)
+
+        self.end_step()
+
+    def settle_arrays(self, engine):
+
+        """Hand over the holdings and wealth of the fills between ArrayEngine agents."""
+
+        for asset, book in enumerate(self.books.values()):
+
+            buyers, sellers, prices, quantities = book.take_fills()
+
+            np.add.at(engine.holdings, (buyers, asset), quantities)
+
+            np.subtract.at(engine.holdings, (sellers, asset), quantities)
+
+            np.subtract.at(engine.wealth, buyers, prices * quantities)
+
+            np.add.at(engine.wealth, sellers, prices * quantities)
+
+            engine.transactions[buyers] += 1
+
+            self.fills += len(buyers)
+
+        self.end_step()
+
+    def end_step(self):
+
+        """Move every traded asset to its last price and clear the books for the next step."""
+
+        for name, book in self.books.items():
+
+            if book.last_tick is not None:
+
+                self.market.get_asset(name).update_price(book.last_price())
+
+            book.last_tick = None
+
+            book.clear()
+
+        self.last_orders, self.last_fills = self.orders, self.fills
+
+        self.orders = 0
+
+        self.fills = 0
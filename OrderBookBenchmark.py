@@ -0,0 +1,155 @@
+import argparse
+import json
+import platform
+import time
+import numpy as np
+from OrderBook import LimitOrderBook, BUY, SELL
+import FinancialModel
+
+
+def random_orders(rng, number_of_orders, price=1.0, spread=0.05, max_quantity=5):
+
+    """Return the sides, limit prices and quantities of random orders around a price."""
+
+    sides = np.where(rng.random(number_of_orders) < 0.5, BUY, SELL)
+
+    prices = price * (1 + rng.uniform(-spread, spread, number_of_orders))
+
+    quantities = rng.integers(1, max_quantity + 1, number_of_orders)
+
+    return sides.tolist(), prices.tolist(), quantities.tolist()
+
+
+def run_book(number_of_orders, steps, seed=0, tick_size=0.01, spread=0.05):
+
+    """Submit number_of_orders random orders to a cleared book every step, and return its throughput and latencies."""
+
+    rng = np.random.default_rng(seed)
+
+    book = LimitOrderBook(tick_size)
+
+    step_seconds = np.empty(steps)
+
+    fills = 0
+
+    for step in range(steps):
+
+        sides, prices, quantities = random_orders(rng, number_of_orders, spread=spread)
+
+        submit = book.submit
+
+        started = time.perf_counter()
+
+        for owner in range(number_of_orders):
+
+            submit(owner, sides[owner], prices[owner], quantities[owner])
+
+        step_seconds[step] = time.perf_counter() - started
+
+        fills += len(book.take_fills()[0])
+
+        book.clear()
+
+    # Time every order of one more step on its own, because the timer calls slow the loop down.
+    sides, prices, quantities = random_orders(rng, number_of_orders, spread=spread)
+
+    latencies = np.empty(number_of_orders)
+
+    for owner in range(number_of_orders):
+
+        started = time.perf_counter_ns()
+
+        book.submit(owner, sides[owner], prices[owner], quantities[owner])
+
+        latencies[owner] = time.perf_counter_ns() - started
+
+    return {
+        "orders_per_step": number_of_orders,
+        "steps": steps,
+        "orders_per_second": number_of_orders * steps / step_seconds.sum(),
+        "fills_per_step": fills / steps,
+        "step_p50_ms": float(np.percentile(step_seconds, 50) * 1000),
+        "step_p99_ms": float(np.percentile(step_seconds, 99) * 1000),
+        "order_p50_us": float(np.percentile(latencies, 50) / 1000),
+        "order_p99_us": float(np.percentile(latencies, 99) / 1000),
+        "order_max_us": float(latencies.max() / 1000),
+    }
+
+
+def run_model(number_of_agents, steps, seed=0):
+
+    """Time the steps of an array engine model whose agents all quote to the order book."""
+
+    side = int(np.ceil(np.sqrt(number_of_agents)))
+
+    model = FinancialModel.FinancialModel(number_of_agents, side, side, "Asset Trading", engine="array", seed=seed, order_book=True)
+
+    step_seconds = np.empty(steps)
+
+    orders = 0
+
+    for step in range(steps):
+
+        started = time.perf_counter()
+
+        model.step()
+
+        step_seconds[step] = time.perf_counter() - started
+
+        orders += model.order_book.last_orders
+
+    return {
+        "agents": number_of_agents,
+        "steps": steps,
+        "orders_per_step": orders / steps,
+        "orders_per_second": orders / step_seconds.sum(),
+        "step_p50_ms": float(np.percentile(step_seconds, 50) * 1000),
+        "step_p99_ms": float(np.percentile(step_seconds, 99) * 1000),
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the throughput and latency of the limit order book.")
+
+    parser.add_argument("--orders", type=int, nargs="+", default=[10000, 100000, 300000], help="orders per step")
+
+    parser.add_argument("--agents", type=int, nargs="*", default=[100000], help="agents of the model runs")
+
+    parser.add_argument("--steps", type=int, default=5)
+
+    parser.add_argument("--seed", type=int, default=0)
+
+    parser.add_argument("--tick-size", type=float, default=0.01)
+
+    parser.add_argument("--spread", type=float, default=0.05, help="how far the limits are from the price, as a fraction")
+
+    parser.add_argument("--output", default="order_book_results.json")
+
+    args = parser.parse_args()
+
+    results = {"book": [], "model": []}
+
+    for number_of_orders in args.orders:
+
+        result = run_book(number_of_orders, args.steps, args.seed, args.tick_size, args.spread)
+
+        results["book"].append(result)
+
+        print("book, {} orders/step: {:.0f} orders/s, {:.0f} fills/step, order p50 {:.2f} us, p99 {:.2f} us".format(
+            number_of_orders, result["orders_per_second"], result["fills_per_step"], result["order_p50_us"], result["order_p99_us"]))
+
+    for number_of_agents in args.agents:
+
+        result = run_model(number_of_agents, args.steps, args.seed)
+
+        results["model"].append(result)
+
+        print("model, {} agents: {:.0f} orders/step, {:.0f} orders/s, step p50 {:.1f} ms".format(
+            number_of_agents, result["orders_per_step"], result["orders_per_second"], result["step_p50_ms"]))
+
+    with open(args.output, "w") as file:
+
+        json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, file, indent=2)
+
+    print("Results are in " + args.output + ".")
@@ -0,0 +1,70 @@
+class PhaseTimer:
+
+    """Cumulative and per-step timers and counters for the phases of a model step.
+
+    The model and agents only time a phase after checking `enabled`, so a
+    disabled timer costs one attribute lookup per check.
+    """
+
+    def __init__(self, enabled=False):
+
+        self.enabled = enabled
+
+        # Seconds and calls per phase since the start of the run.
+        self.total_seconds = {}
+
+        self.total_counts = {}
+
+        # Seconds and calls per phase in the current and the previous step.
+        self.step_seconds = {}
+
+        self.step_counts = {}
+
+        self.previous_step_seconds = {}
+
+    def begin_step(self):
+
+        """Start timing a new step."""
+
+        self.previous_step_seconds = self.step_seconds
+
+        self.step_seconds = {}
+
+        self.step_counts = {}
+
+    def add(self, phase, seconds):
+
+        """Add one timed call of a phase."""
+
+        self.step_seconds[phase] = self.step_seconds.get(phase, 0.0) + seconds
+
+        self.step_counts[phase] = self.step_counts.get(phase, 0) + 1
+
+        self.total_seconds[phase] = self.total_seconds.get(phase, 0.0) + seconds
+
+        self.total_counts[phase] = self.total_counts.get(phase, 0) + 1
+
+    def step_ms(self, phase):
+
+        return self.step_seconds.get(phase, 0.0) * 1000
+
+    def previous_step_ms(self, phase):
+
+        return self.previous_step_seconds.get(phase, 0.0) * 1000
+
+    def step_count(self, phase):
+
+        return self.step_counts.get(phase, 0)
+
+    def total_ms(self, phase):
+
+        return self.total_seconds.get(phase, 0.0) * 1000
+
+    def summary(self):
+
+        """Return the total time, number of calls and mean time of every phase."""
+
+        return {phase: {"total_ms": self.total_ms(phase),
+                        "count": self.total_counts[phase],
+                        "mean_ms": self.total_ms(phase) / self.total_counts[phase]}
+                for phase in self.total_seconds}
@@ -0,0 +1,133 @@
+import numpy as np
+
+class PriceHistory:
+
+    """An array-backed price history with O(1) running statistics.
+
+    The buffer grows by doubling. With a window it stops growing at that size
+    and becomes a ring buffer, so memory stays bounded however long the run
+    is. Without a window every price is kept. The running mean, variance,
+    minimum and maximum always cover every price ever appended; the windowed
+    mean only covers the prices still in the buffer.
+    """
+
+    def __init__(self, window=None, initial_capacity=16):
+
+        self.window = window
+
+        # Start with a small buffer that grows up to the window.
+        self.prices = np.empty(initial_capacity if window is None else min(window, initial_capacity), dtype=np.float64)
+
+        # Index of the next write and number of prices held in the buffer.
+        self.head = 0
+
+        self.size = 0
+
+        # Running statistics over every price ever appended (Welford).
+        self.count = 0
+
+        self.running_mean = 0.0
+
+        self.squared_deviations = 0.0
+
+        self.minimum = None
+
+        self.maximum = None
+
+        # Sum of the prices in the buffer, for the windowed mean.
+        self.window_sum = 0.0
+
+    def append(self, price):
+
+        """Record a new price."""
+
+        if self.size == len(self.prices) and self.size != self.window:
+
+            capacity = 2 * len(self.prices) if self.window is None else min(2 * len(self.prices), self.window)
+
+            self.prices = np.concatenate([self.prices, np.empty(capacity - len(self.prices), dtype=np.float64)])
+
+        # Drop the oldest price from the window once the ring buffer is full.
+        if self.window is not None and self.size == self.window:
+
+            self.window_sum -= self.prices[self.head]
+
+        else:
+
+            self.size += 1
+
+        self.prices[self.head] = price
+
+        self.window_sum += price
+
+        self.head += 1
+
+        if self.window is not None and self.head == self.window:
+
+            self.head = 0
+
+            # Recompute the sum once per lap so rounding errors cannot build up.
+            self.window_sum = float(self.prices.sum())
+
+        # Update the running statistics.
+        self.count += 1
+
+        delta = price - self.running_mean
+
+        self.running_mean += delta / self.count
+
+        self.squared_deviations += delta * (price - self.running_mean)
+
+        if self.minimum is None or price < self.minimum:
+
+            self.minimum = price
+
+        if self.maximum is None or price > self.maximum:
+
+            self.maximum = price
+
+    def __len__(self):
+
+        return self.size
+
+    def __iter__(self):
+
+        return iter(self.to_array())
+
+    def to_array(self):
+
+        """Return the prices in the buffer, oldest first."""
+
+        if self.window is None or self.size < self.window:
+
+            return self.prices[:self.size].copy()
+
+        return np.concatenate([self.prices[self.head:], self.prices[:self.head]])
+
+    def last(self):
+
+        return self.prices[self.head - 1]
+
+    def mean(self):
+
+        return self.running_mean
+
+    def variance(self):
+
+        return self.squared_deviations / self.count if self.count else 0.0
+
+    def std(self):
+
+        return self.variance() ** 0.5
+
+    def min(self):
+
+        return self.minimum
+
+    def max(self):
+
+        return self.maximum
+
+    def window_mean(self):
+
+        return self.window_sum / self.size
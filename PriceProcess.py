@@ -0,0 +1,229 @@
+import numpy as np
+
+# Every price process by name.
+PRICE_PROCESSES = {}
+
+
+class PriceProcess:
+
+    """Seeded price paths for every asset of a market, generated in blocks.
+
+    A block holds the prices of block_size ticks for all assets, drawn with
+    NumPy in one go and continuing from the last row of the block before,
+    so next() only returns a row and moves an index along. Subclasses fill
+    generate_block(), which gets the last prices and returns the next
+    block_size rows.
+    """
+
+    name = None
+
+    def __init__(self, block_size=1024, seed=None):
+
+        self.block_size = block_size
+
+        self.rng = np.random.default_rng(seed)
+
+        self.block = None
+
+        self.position = 0
+
+        # The prices of the last tick served, and the number of ticks served.
+        self.prices = None
+
+        self.ticks = 0
+
+    def start(self, initial_prices):
+
+        """Start the paths at the given prices, one per asset."""
+
+        self.prices = np.asarray(initial_prices, dtype=np.float64).copy()
+
+        self.block = None
+
+        self.position = 0
+
+        self.ticks = 0
+
+    def next(self):
+
+        """Return the prices of the next tick for every asset."""
+
+        if self.block is None or self.position == len(self.block):
+
+            self.block = self.generate_block(self.prices)
+
+            self.position = 0
+
+        self.prices = self.block[self.position]
+
+        self.position += 1
+
+        self.ticks += 1
+
+        return self.prices
+
+    def generate_block(self, prices):
+
+        raise NotImplementedError
+
+    def parameters(self):
+
+        """Return the keyword arguments that recreate this process."""
+
+        return {"block_size": self.block_size}
+
+    def get_state(self):
+
+        return {"block": self.block, "position": self.position, "prices": self.prices, "ticks": self.ticks,
+                "rng": self.rng.bit_generator.state}
+
+    def set_state(self, state):
+
+        self.block, self.position, self.prices, self.ticks = state["block"], state["position"], state["prices"], state["ticks"]
+
+        self.rng.bit_generator.state = state["rng"]
+
+
+def register_price_process(process_class):
+
+    PRICE_PROCESSES[process_class.name] = process_class
+
+    return process_class
+
+
+def make_price_process(process, seed=None):
+
+    """Return a price process from a name, or the process itself if it is one already."""
+
+    if isinstance(process, PriceProcess):
+
+        return process
+
+    try:
+
+        return PRICE_PROCESSES[process](seed=seed)
+
+    except KeyError:
+
+        raise ValueError("Unknown price process: " + str(process)) from None
+
+
+@register_price_process
+class GeometricBrownianMotion(PriceProcess):
+
+    """Prices with normally distributed log returns of drift mu and volatility sigma per tick."""
+
+    name = "gbm"
+
+    def __init__(self, mu=0.0, sigma=0.01, block_size=1024, seed=None):
+
+        super().__init__(block_size, seed)
+
+        self.mu = mu
+
+        self.sigma = sigma
+
+    def log_returns(self, number_of_assets):
+
+        return (self.mu - self.sigma ** 2 / 2) + self.sigma * self.rng.standard_normal((self.block_size, number_of_assets))
+
+    def generate_block(self, prices):
+
+        return prices * np.exp(np.cumsum(self.log_returns(len(prices)), axis=0))
+
+    def parameters(self):
+
+        return dict(super().parameters(), mu=self.mu, sigma=self.sigma)
+
+
+@register_price_process
+class OrnsteinUhlenbeck(PriceProcess):
+
+    """Prices pulled back towards a mean at rate theta per tick, with noise of volatility sigma.
+
+    The mean defaults to the starting price of each asset. The prices are
+    kept at or above floor, as the process itself can go negative.
+    """
+
+    name = "ou"
+
+    def __init__(self, theta=0.05, sigma=0.01, mean=None, floor=0.01, block_size=1024, seed=None):
+
+        super().__init__(block_size, seed)
+
+        self.theta = theta
+
+        self.sigma = sigma
+
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+
+        self.floor = floor
+
+    def start(self, initial_prices):
+
+        super().start(initial_prices)
+
+        if self.mean is None:
+
+            self.mean = self.prices.copy()
+
+    def generate_block(self, prices):
+
+        # The exact one-tick transition: the deviation decays by a and gains normal noise of the given scale.
+        a = np.exp(-self.theta)
+
+        scale = self.sigma * np.sqrt((1 - a ** 2) / (2 * self.theta))
+
+        noise = scale * self.rng.standard_normal((self.block_size, len(prices)))
+
+        deviations = np.empty_like(noise)
+
+        deviation = prices - self.mean
+
+        # The recursion runs along the block, over all assets at once.
+        for tick in range(self.block_size):
+
+            deviation = a * deviation + noise[tick]
+
+            deviations[tick] = deviation
+
+        return np.maximum(self.mean + deviations, self.floor)
+
+    def parameters(self):
+
+        return dict(super().parameters(), theta=self.theta, sigma=self.sigma, mean=self.mean, floor=self.floor)
+
+
+@register_price_process
+class JumpDiffusion(GeometricBrownianMotion):
+
+    """Geometric Brownian motion with Poisson jumps (Merton).
+
+    On average jump_rate jumps happen per tick, each adding a normally
+    distributed log return of mean jump_mean and volatility jump_sigma.
+    """
+
+    name = "jump"
+
+    def __init__(self, mu=0.0, sigma=0.01, jump_rate=0.01, jump_mean=0.0, jump_sigma=0.1, block_size=1024, seed=None):
+
+        super().__init__(mu, sigma, block_size, seed)
+
+        self.jump_rate = jump_rate
+
+        self.jump_mean = jump_mean
+
+        self.jump_sigma = jump_sigma
+
+    def log_returns(self, number_of_assets):
+
+        returns = super().log_returns(number_of_assets)
+
+        # The sum of n normal jumps is normal, with n times the mean and variance.
+        jumps = self.rng.poisson(self.jump_rate, returns.shape)
+
+        return returns + jumps * self.jump_mean + np.sqrt(jumps) * self.jump_sigma * self.rng.standard_normal(returns.shape)
+
+    def parameters(self):
+
+        return dict(super().parameters(), jump_rate=self.jump_rate, jump_mean=self.jump_mean, jump_sigma=self.jump_sigma)
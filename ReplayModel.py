@@ -0,0 +1,123 @@
+from mesa import Agent, Model
+from mesa.space import MultiGrid
+from mesa.time import BaseScheduler
+import numpy as np
+from MetricsCollector import MetricsCollector, SummaryReporter
+from RunRecorder import Replay
+
+class ReplayAgent(Agent):
+
+    """A stand-in for a recorded agent. It has no behaviour of its own."""
+
+    def __init__(self, unique_id: int, model, wealth):
+
+        super().__init__(unique_id, model)
+
+        self.wealth = wealth
+
+    def step(self):
+
+        pass
+
+
+class ReplayModel(Model):
+
+    """Plays back a run recorded by RunRecorder, starting at any step.
+
+    Seeking rebuilds the state from the nearest keyframe, and every step
+    applies one step of recorded deltas, so no strategy logic runs.
+    """
+
+    def __init__(self, path, start_step=0):
+
+        self.replay = Replay(path)
+
+        self.strategy = self.replay.meta["strategy"]
+
+        self.array_engine = None
+
+        self.running = True
+
+        state = self.replay.state_at(start_step)
+
+        self.grid = MultiGrid(self.replay.meta["width"], self.replay.meta["height"], True)
+
+        self.schedule = BaseScheduler(self)
+
+        self.schedule.steps = self.schedule.time = min(max(start_step, 0), self.replay.steps)
+
+        # Create a stand-in agent for every recorded agent.
+        self.replay_agents = []
+
+        for i in range(len(state["wealth"])):
+
+            agent = ReplayAgent(i, self, float(state["wealth"][i]))
+
+            self.schedule.add(agent)
+
+            self.grid.place_agent(agent, (int(state["x"][i]), int(state["y"][i])))
+
+            self.replay_agents.append(agent)
+
+        self.prices = state["prices"]
+
+        self.metrics = MetricsCollector(
+            model_reporters={
+                "Gini": self.compute_gini,
+                "Wealthiest Agent": SummaryReporter("wealthiest"),
+                "Wealthy Agents": SummaryReporter("wealthy"),
+                "Non Wealthy Agents": SummaryReporter("non_wealthy"),
+            },
+        )
+
+        # The charts look the collector up by these names.
+        self.datacollector_gini = self.metrics
+
+        self.datacollector_wealthiest_agent = self.metrics
+
+        self.datacollector_currents = self.metrics
+
+        self.metrics.collect(self)
+
+    def step(self):
+
+        """Apply the next recorded step."""
+
+        if self.schedule.time >= self.replay.steps:
+
+            self.running = False
+
+            return
+
+        self.schedule.steps += 1
+
+        self.schedule.time += 1
+
+        changes = self.replay.deltas(self.schedule.time)
+
+        for i, x, y in zip(changes["move"]["agents"], changes["move"]["x"], changes["move"]["y"]):
+
+            self.grid.move_agent(self.replay_agents[i], (int(x), int(y)))
+
+        for i, wealth in zip(changes["wealth"]["agents"], changes["wealth"]["wealth"]):
+
+            self.replay_agents[i].wealth = float(wealth)
+
+        self.prices = self.replay.arrays["prices"][self.schedule.time]
+
+        self.metrics.collect(self)
+
+    def compute_gini(self):
+
+        x = np.sort([agent.wealth for agent in self.replay_agents])
+
+        N = len(x)
+
+        B = np.sum(x * (N - np.arange(N))) / (N * np.sum(x))
+
+        return float(1 + (1 / N) - 2 * B)
+
+    def get_wealthiest_agent(self):
+
+        # The collector has already found it for the current step.
+        return self.metrics.summary["wealthiest"]
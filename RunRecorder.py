@@ -0,0 +1,199 @@
+import json
+import numpy as np
+
+# The per-agent state that is recorded, and its type.
+STATE_FIELDS = {"x": np.int64, "y": np.int64, "wealth": np.float64, "holdings": np.int64}
+
+# Delta streams: every step stores the changed agents and their new values.
+DELTA_FIELDS = {"move": ("x", "y"), "wealth": ("wealth",), "holdings": ("holdings",)}
+
+
+def extract_state(model):
+
+    """Return the agent positions, wealth, asset holdings and prices of a FinancialModel as arrays."""
+
+    prices = model.market.get_prices()
+
+    engine = model.array_engine
+
+    if engine is not None:
+
+        return {"x": engine.x.copy(), "y": engine.y.copy(), "wealth": engine.wealth.copy(),
+                "holdings": engine.holdings.copy(), "prices": prices}
+
+    agents = sorted(model.schedule.agents, key=lambda agent: agent.unique_id)
+
+    asset_names = model.market.get_asset_names()
+
+    holdings = np.zeros((len(agents), len(asset_names)), dtype=np.int64)
+
+    for i, agent in enumerate(agents):
+
+        for asset in agent.assets:
+
+            holdings[i, asset_names.index(asset.name)] += 1
+
+    return {
+        "x": np.array([agent.pos[0] for agent in agents], dtype=np.int64),
+        "y": np.array([agent.pos[1] for agent in agents], dtype=np.int64),
+        "wealth": np.array([agent.wealth for agent in agents], dtype=np.float64),
+        "holdings": holdings,
+        "prices": prices,
+    }
+
+
+class RunRecorder:
+
+    """Records a run as periodic keyframes and a stream of per-step deltas.
+
+    After every step the recorder compares the state with the previous one and
+    stores only the agents whose position, wealth or holdings changed, plus
+    the asset prices. Every keyframe_interval steps it also stores the full
+    state, so any step can be rebuilt from the nearest keyframe.
+    """
+
+    def __init__(self, model, keyframe_interval=100):
+
+        self.keyframe_interval = keyframe_interval
+
+        self.meta = {
+            "width": model.grid.width,
+            "height": model.grid.height,
+            "strategy": model.strategy,
+            "asset_names": model.market.get_asset_names(),
+        }
+
+        self.state = extract_state(model)
+
+        self.keyframes = {name: [self.state[name]] for name in STATE_FIELDS}
+
+        self.prices = [self.state["prices"]]
+
+        # For each delta stream, the changed agent ids and values of every step.
+        self.deltas = {stream: {"agents": [], **{name: [] for name in fields}} for stream, fields in DELTA_FIELDS.items()}
+
+        self.steps = 0
+
+    def record(self, model):
+
+        """Record the changes made by the step that just ran."""
+
+        state = extract_state(model)
+
+        self.steps += 1
+
+        for stream, fields in DELTA_FIELDS.items():
+
+            changed = np.zeros(len(state["wealth"]), dtype=bool)
+
+            for name in fields:
+
+                difference = state[name] != self.state[name]
+
+                changed |= difference if difference.ndim == 1 else difference.any(axis=1)
+
+            agents = np.flatnonzero(changed)
+
+            self.deltas[stream]["agents"].append(agents)
+
+            for name in fields:
+
+                self.deltas[stream][name].append(state[name][agents])
+
+        self.prices.append(state["prices"])
+
+        if self.steps % self.keyframe_interval == 0:
+
+            for name in STATE_FIELDS:
+
+                self.keyframes[name].append(state[name])
+
+        self.state = state
+
+    def save(self, path):
+
+        """Write the recording to a compressed .npz file."""
+
+        arrays = {"meta": np.array(json.dumps(dict(self.meta, steps=self.steps, keyframe_interval=self.keyframe_interval))), "prices": np.array(self.prices)}
+
+        for name in STATE_FIELDS:
+
+            arrays["keyframe_" + name] = np.array(self.keyframes[name])
+
+        # Concatenate every stream, with an offset per step.
+        for stream, values in self.deltas.items():
+
+            arrays[stream + "_offsets"] = np.cumsum([0] + [len(agents) for agents in values["agents"]])
+
+            for name, chunks in values.items():
+
+                dtype = np.int64 if name == "agents" else STATE_FIELDS[name]
+
+                shape = (0, len(self.meta["asset_names"])) if name == "holdings" else (0,)
+
+                arrays[stream + "_" + name] = np.concatenate(chunks) if chunks else np.empty(shape, dtype=dtype)
+
+        np.savez_compressed(path, **arrays)
+
+
+class Replay:
+
+    """A recorded run that can rebuild the state of any step without running the model."""
+
+    def __init__(self, path):
+
+        with np.load(path) as data:
+
+            self.arrays = dict(data)
+
+        self.meta = json.loads(str(self.arrays["meta"]))
+
+        self.steps = self.meta["steps"]
+
+        self.keyframe_interval = self.meta["keyframe_interval"]
+
+    def deltas(self, step):
+
+        """Return the changes made by the given step, per delta stream."""
+
+        changes = {}
+
+        for stream, fields in DELTA_FIELDS.items():
+
+            offsets = self.arrays[stream + "_offsets"]
+
+            start, end = offsets[step - 1], offsets[step]
+
+            changes[stream] = {name: self.arrays[stream + "_" + name][start:end] for name in ("agents",) + fields}
+
+        return changes
+
+    def apply(self, state, step):
+
+        """Apply the deltas of a step to a state in place."""
+
+        for stream, change in self.deltas(step).items():
+
+            for name in DELTA_FIELDS[stream]:
+
+                state[name][change["agents"]] = change[name]
+
+        state["prices"] = self.arrays["prices"][step]
+
+    def state_at(self, step):
+
+        """Return the state after the given step, starting from the nearest earlier keyframe."""
+
+        step = max(0, min(step, self.steps))
+
+        keyframe = step // self.keyframe_interval
+
+        state = {name: self.arrays["keyframe_" + name][keyframe].copy() for name in STATE_FIELDS}
+
+        state["prices"] = self.arrays["prices"][keyframe * self.keyframe_interval]
+
+        for replayed_step in range(keyframe * self.keyframe_interval + 1, step + 1):
+
+            self.apply(state, replayed_step)
+
+        return state
@@ -0,0 +1,436 @@
+import argparse
+import math
+import multiprocessing
+import time
+import numpy as np
+from ArrayEngine import ArrayEngine
+from CellIndex import CellIndex
+from Market import Market
+from Strategies import lookup_strategy, strategy_counts
+
+# The per-agent arrays a shard owns, and sends along when an agent changes tiles.
+SHARD_FIELDS = ("ids", "x", "y", "wealth", "strategy", "transactions", "holdings")
+
+# The assets every shard's market starts with, as in FinancialModel.
+MARKET_ASSETS = [("Gold", 1), ("Silver", 0.5)]
+
+
+def split(length, parts):
+
+    """Return the start of every part when splitting range(length) into nearly equal parts, and the end."""
+
+    return [length * part // parts for part in range(parts + 1)]
+
+
+def choose_tiles(processes, width, height):
+
+    """Split the processes into tiles_x x tiles_y tiles, as close to the grid's aspect ratio as possible."""
+
+    best = None
+
+    for tiles_x in range(1, processes + 1):
+
+        if processes % tiles_x or tiles_x > width or processes // tiles_x > height:
+
+            continue
+
+        tiles_y = processes // tiles_x
+
+        mismatch = abs(math.log((width / tiles_x) / (height / tiles_y)))
+
+        if best is None or mismatch < best[0]:
+
+            best = (mismatch, tiles_x, tiles_y)
+
+    if best is None:
+
+        raise ValueError("Cannot split a " + str(width) + "x" + str(height) + " grid into " + str(processes) + " tiles")
+
+    return best[1], best[2]
+
+
+def bucket_gini(keys, counts, sums):
+
+    """Compute the Gini coefficient from wealth buckets, as GiniTracker does.
+
+    keys are the bucket numbers, and counts and sums the number and the total
+    wealth of the agents in each bucket. Agents in the same bucket count as
+    equally wealthy.
+    """
+
+    order = np.argsort(keys)
+
+    counts, sums = counts[order], sums[order]
+
+    total = sums.sum()
+
+    count = counts.sum()
+
+    if total == 0:
+
+        return 0.0
+
+    # Every bucket against all of the poorer buckets before it.
+    counts_before = np.cumsum(counts) - counts
+
+    sums_before = np.cumsum(sums) - sums
+
+    pair_sum = np.sum(sums * counts_before - counts * sums_before)
+
+    return float(pair_sum / (count * total))
+
+
+class ShardEngine(ArrayEngine):
+
+    """The agents in one tile of the grid, kept with local cell numbers.
+
+    Positions are global, so moves wrap around the whole toroidal grid, but
+    the cell index only covers the tile.
+    """
+
+    def __init__(self, state, bounds, width, height, market, mean_reversion_threshold, seed):
+
+        super().__init__(0, width, height, "Random", market=market,
+                         mean_reversion_threshold=mean_reversion_threshold, seed=seed)
+
+        self.x0, self.x1, self.y0, self.y1 = bounds
+
+        self.tile_height = self.y1 - self.y0
+
+        self.cell_index = CellIndex((self.x1 - self.x0) * self.tile_height)
+
+        self.ids = np.empty(0, dtype=np.int64)
+
+        self.put([state])
+
+    def cells(self):
+
+        return (self.x - self.x0) * self.tile_height + (self.y - self.y0)
+
+    def take(self, mask):
+
+        """Remove the agents in mask and return their arrays."""
+
+        state = {name: getattr(self, name)[mask] for name in SHARD_FIELDS}
+
+        keep = ~mask
+
+        for name in SHARD_FIELDS:
+
+            setattr(self, name, getattr(self, name)[keep])
+
+        self.num_agents = len(self.ids)
+
+        return state
+
+    def put(self, states):
+
+        """Add the agents in a list of states returned by take()."""
+
+        for name in SHARD_FIELDS:
+
+            setattr(self, name, np.concatenate([getattr(self, name)] + [state[name] for state in states]))
+
+        self.num_agents = len(self.ids)
+
+    def summary(self, resolution):
+
+        """Return the wealth aggregates of the shard, with the wealth in buckets for the Gini coefficient."""
+
+        keys, inverse = np.unique(np.round(self.wealth / resolution).astype(np.int64), return_inverse=True)
+
+        return {
+            "count": self.num_agents,
+            "wealthiest": float(self.wealth.max(initial=-np.inf)),
+            "wealthy": self.current_wealthy_agents(),
+            "non_wealthy": self.current_non_wealthy_agents(),
+            "total_wealth": float(self.wealth.sum()),
+            "transactions": self.total_transactions(),
+            "keys": keys,
+            "counts": np.bincount(inverse.ravel(), minlength=len(keys)),
+            "sums": np.bincount(inverse.ravel(), weights=self.wealth, minlength=len(keys)),
+        }
+
+
+def shard_worker(connection, tile, tiles, width, height, state, mean_reversion_threshold, resolution, seed):
+
+    """Run one tile in a worker process, answering the coordinator's commands."""
+
+    tiles_x, tiles_y = tiles
+
+    x_bounds, y_bounds = split(width, tiles_x), split(height, tiles_y)
+
+    tile_x, tile_y = divmod(tile, tiles_y)
+
+    # The tile every column and row of the grid belongs to.
+    tile_of_x = np.repeat(np.arange(tiles_x), np.diff(x_bounds))
+
+    tile_of_y = np.repeat(np.arange(tiles_y), np.diff(y_bounds))
+
+    bounds = (x_bounds[tile_x], x_bounds[tile_x + 1], y_bounds[tile_y], y_bounds[tile_y + 1])
+
+    engine = ShardEngine(state, bounds, width, height, Market(MARKET_ASSETS), mean_reversion_threshold, seed)
+
+    while True:
+
+        command, payload = connection.recv()
+
+        if command == "move":
+
+            engine.move()
+
+            # Hand over the agents that left the tile, by the tile they moved to.
+            destinations = tile_of_x[engine.x] * tiles_y + tile_of_y[engine.y]
+
+            leaving = engine.take(destinations != tile)
+
+            leaving_destinations = destinations[destinations != tile]
+
+            connection.send({destination: {name: values[leaving_destinations == destination] for name, values in leaving.items()}
+                             for destination in np.unique(leaving_destinations).tolist()})
+
+        elif command == "trade":
+
+            # Every agent is in its own tile again, so every trade is between agents of this shard.
+            immigrants, tick = payload
+
+            engine.put(immigrants)
+
+            if tick:
+
+                engine.market.tick(0.1)
+
+            engine.trade()
+
+            engine.time += 1
+
+            connection.send(engine.summary(resolution))
+
+        elif command == "state":
+
+            connection.send({name: getattr(engine, name) for name in SHARD_FIELDS})
+
+        elif command == "stop":
+
+            connection.close()
+
+            return
+
+
+class ShardedSimulation:
+
+    """One array engine simulation split over worker processes by tiles of the grid.
+
+    The toroidal grid is cut into tiles_x x tiles_y tiles, and every tile's
+    agents live in their own process. A step has two phases: every shard
+    moves its agents and hands the ones that crossed its border to the
+    coordinator, which passes them to the tiles they moved into. Trades only
+    happen between agents in the same cell, so once the agents have arrived
+    every shard trades on its own. The shards then report their wealth
+    aggregates, which are combined into the step's metrics.
+
+    Each shard draws from its own random stream, so a run depends on the
+    seed and the number of tiles.
+    """
+
+    def __init__(self, number_of_agents, width, height, strategy, processes=None, tiles=None, seed=None,
+                 mean_reversion_threshold=1.0, resolution=0.01):
+
+        if number_of_agents > width * height:
+
+            raise ValueError("There are more agents than cells")
+
+        self.num_agents = number_of_agents
+
+        self.width = width
+
+        self.height = height
+
+        self.strategy = strategy
+
+        self.tiles = tiles or choose_tiles(processes or multiprocessing.cpu_count(), width, height)
+
+        self.number_of_tiles = self.tiles[0] * self.tiles[1]
+
+        self.resolution = resolution
+
+        self.steps = 0
+
+        self.model_vars = {name: [] for name in ("Gini", "Wealthiest Agent", "Wealthy Agents", "Non Wealthy Agents", "Total Wealth", "Transactions")}
+
+        # Place the agents one per cell, as FinancialModel does, and deal them out to their tiles.
+        seeds = np.random.SeedSequence(seed).spawn(self.number_of_tiles + 1)
+
+        rng = np.random.default_rng(seeds[0])
+
+        cells = rng.choice(width * height, number_of_agents, replace=False)
+
+        counts = strategy_counts(strategy, number_of_agents)
+
+        state = {
+            "ids": np.arange(number_of_agents, dtype=np.int64),
+            "x": cells // height,
+            "y": cells % height,
+            "wealth": np.ones(number_of_agents),
+            "strategy": np.repeat(np.array([lookup_strategy(name).id for name, _ in counts], dtype=np.int8), [count for _, count in counts]),
+            "transactions": np.zeros(number_of_agents, dtype=np.int64),
+            "holdings": np.ones((number_of_agents, len(MARKET_ASSETS)), dtype=np.int64),
+        }
+
+        tile_of_x = np.repeat(np.arange(self.tiles[0]), np.diff(split(width, self.tiles[0])))
+
+        tile_of_y = np.repeat(np.arange(self.tiles[1]), np.diff(split(height, self.tiles[1])))
+
+        tile_of_agent = tile_of_x[state["x"]] * self.tiles[1] + tile_of_y[state["y"]]
+
+        self.connections = []
+
+        self.workers = []
+
+        for tile in range(self.number_of_tiles):
+
+            parent, child = multiprocessing.Pipe()
+
+            tile_state = {name: values[tile_of_agent == tile] for name, values in state.items()}
+
+            worker = multiprocessing.Process(target=shard_worker, daemon=True, args=(
+                child, tile, self.tiles, width, height, tile_state, mean_reversion_threshold, resolution, seeds[tile + 1]))
+
+            worker.start()
+
+            child.close()
+
+            self.connections.append(parent)
+
+            self.workers.append(worker)
+
+    def broadcast(self, command, payloads=None):
+
+        """Send a command to every shard, and return their answers once all of them have run it."""
+
+        for tile, connection in enumerate(self.connections):
+
+            connection.send((command, payloads[tile] if payloads is not None else None))
+
+        return [connection.recv() for connection in self.connections]
+
+    def step(self):
+
+        """Advance every shard by one step, and collect the global metrics."""
+
+        # Move, and route the agents that crossed a border to their new tiles.
+        emigrants = self.broadcast("move")
+
+        immigrants = [[outgoing[tile] for outgoing in emigrants if tile in outgoing] for tile in range(self.number_of_tiles)]
+
+        # Increase the prices every 10 steps, as FinancialModel does, in every shard's market.
+        tick = self.steps % 10 == 0
+
+        summaries = self.broadcast("trade", [(arriving, tick) for arriving in immigrants])
+
+        self.steps += 1
+
+        self.collect(summaries)
+
+    def collect(self, summaries):
+
+        """Combine the summaries of the shards into the metrics of the step."""
+
+        keys = np.concatenate([summary["keys"] for summary in summaries])
+
+        merged_keys, inverse = np.unique(keys, return_inverse=True)
+
+        counts = np.bincount(inverse.ravel(), weights=np.concatenate([summary["counts"] for summary in summaries]), minlength=len(merged_keys))
+
+        sums = np.bincount(inverse.ravel(), weights=np.concatenate([summary["sums"] for summary in summaries]), minlength=len(merged_keys))
+
+        self.model_vars["Gini"].append(bucket_gini(merged_keys, counts, sums))
+
+        self.model_vars["Wealthiest Agent"].append(max(summary["wealthiest"] for summary in summaries))
+
+        self.model_vars["Wealthy Agents"].append(sum(summary["wealthy"] for summary in summaries))
+
+        self.model_vars["Non Wealthy Agents"].append(sum(summary["non_wealthy"] for summary in summaries))
+
+        self.model_vars["Total Wealth"].append(sum(summary["total_wealth"] for summary in summaries))
+
+        self.model_vars["Transactions"].append(sum(summary["transactions"] for summary in summaries))
+
+    def run(self, steps):
+
+        for _ in range(steps):
+
+            self.step()
+
+    def gather(self):
+
+        """Return the arrays of every agent, in agent id order."""
+
+        states = self.broadcast("state")
+
+        ids = np.concatenate([state["ids"] for state in states])
+
+        order = np.argsort(ids)
+
+        return {name: np.concatenate([state[name] for state in states])[order] for name in SHARD_FIELDS}
+
+    def compute_gini(self):
+
+        return self.model_vars["Gini"][-1] if self.steps else 0.0
+
+    def close(self):
+
+        """Stop the worker processes."""
+
+        for connection in self.connections:
+
+            connection.send(("stop", None))
+
+            connection.close()
+
+        for worker in self.workers:
+
+            worker.join()
+
+        self.connections = []
+
+        self.workers = []
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run one large array engine simulation over several processes.")
+
+    parser.add_argument("--agents", type=int, default=1000000)
+
+    parser.add_argument("--size", default="2000x2000", help="grid size as WIDTHxHEIGHT")
+
+    parser.add_argument("--strategy", default="Wealth Trading")
+
+    parser.add_argument("--steps", type=int, default=50)
+
+    parser.add_argument("--processes", type=int, default=None)
+
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    width, height = (int(side) for side in args.size.lower().split("x"))
+
+    with ShardedSimulation(args.agents, width, height, args.strategy, args.processes, seed=args.seed) as simulation:
+
+        started = time.perf_counter()
+
+        simulation.run(args.steps)
+
+        seconds = time.perf_counter() - started
+
+        print("{} tiles: {:.1f} steps/s, Gini {:.4f}".format(simulation.number_of_tiles, args.steps / seconds, simulation.compute_gini()))
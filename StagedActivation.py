@@ -0,0 +1,190 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from mesa.time import BaseScheduler
+from CellIndex import choose_cellmate
+from TradeEventSink import OFF
+
+
+class CellTrades:
+
+    """The trades of the agents in one cell during one step.
+
+    Every cell draws from its own generator, seeded from the step's seed and
+    the cell, so the trades of a cell do not depend on the other cells or on
+    the order in which the cells are handled. When timed, every trade's
+    strategy time is kept in timings, for the scheduler to add to the
+    model's timer after the workers are done.
+    """
+
+    def __init__(self, grid, pos, step_seed, timed=False):
+
+        self.grid = grid
+
+        self.agents = list(grid.grid[pos[0]][pos[1]])
+
+        self.random = random.Random("{}:{}:{}".format(step_seed, pos[0], pos[1]))
+
+        self.proposals = []
+
+        self.trades = []
+
+        self.timed = timed
+
+        self.timings = []
+
+    def propose(self):
+
+        """Every agent with wealth proposes a trade to a random cellmate."""
+
+        for agent in self.agents:
+
+            if agent.wealth > 0 and not agent.quotes():
+
+                self.proposals.append((agent, choose_cellmate(self.grid, agent, self.random)))
+
+    def resolve(self):
+
+        """Accept the proposals in random order, skipping those of agents that already have a trade."""
+
+        self.random.shuffle(self.proposals)
+
+        matched = set()
+
+        for agent, other in self.proposals:
+
+            if agent.unique_id not in matched and other.unique_id not in matched:
+
+                self.trades.append((agent, other))
+
+                matched.add(agent.unique_id)
+
+                matched.add(other.unique_id)
+
+    def apply(self):
+
+        for agent, other in self.trades:
+
+            if self.timed:
+
+                started = perf_counter()
+
+            agent.trade_strategy.trade(agent, other, self.random)
+
+            if self.timed:
+
+                self.timings.append(("strategy: " + agent.trade_strategy.name, perf_counter() - started))
+
+
+class StagedTradeActivation(BaseScheduler):
+
+    """A scheduler that runs a step in stages instead of agent by agent.
+
+    Every agent moves, in random order. Then, in every cell with more than
+    one agent, the agents with wealth propose a trade to a random cellmate,
+    the proposals are accepted in random order so that each agent takes
+    part in at most one trade, and the accepted trades are applied. The cells
+    do not share any state, so with workers > 1 the cells are handled by a
+    thread pool, and a seeded model gives the same result with any number of
+    workers. The model settles the orders of the quoting agents after the
+    step, as with random activation.
+    """
+
+    def __init__(self, model, workers=None):
+
+        super().__init__(model)
+
+        self.workers = workers
+
+        self.pool = ThreadPoolExecutor(workers) if workers is not None and workers > 1 else None
+
+    def step(self):
+
+        model = self.model
+
+        timer = model.phase_timer
+
+        started = perf_counter()
+
+        for agent in self.agent_buffer(shuffled=True):
+
+            agent.move()
+
+        moved = perf_counter()
+
+        # With an order book the quoting agents place their orders, in random order, instead of proposing trades.
+        if model.order_book is not None:
+
+            for agent in self.agent_buffer(shuffled=True):
+
+                if agent.quotes():
+
+                    agent.quote()
+
+        # The cells with a possible trade, in a fixed order.
+        step_seed = model.random.getrandbits(64)
+
+        positions = sorted({agent.pos for agent in self.agents if len(model.grid.grid[agent.pos[0]][agent.pos[1]]) > 1})
+
+        cells = [CellTrades(model.grid, pos, step_seed, timer.enabled) for pos in positions]
+
+        self.run_stage(cells, CellTrades.propose)
+
+        self.run_stage(cells, CellTrades.resolve)
+
+        trades = [trade for cell in cells for trade in cell.trades]
+
+        participants = [agent for trade in trades for agent in trade]
+
+        old_wealth = [agent.wealth for agent in participants]
+
+        # Keep the Gini tracker out of the way of the workers, and update it afterwards.
+        gini_tracker, model.gini_tracker = model.gini_tracker, None
+
+        try:
+
+            # Trade events are written in order, so they need the trades to run one after another.
+            self.run_stage(cells, CellTrades.apply, parallel=model.trade_events.level >= OFF)
+
+        finally:
+
+            model.gini_tracker = gini_tracker
+
+        if gini_tracker is not None:
+
+            for agent, wealth in zip(participants, old_wealth):
+
+                gini_tracker.update(wealth, agent.wealth)
+
+        # Add the trades to the model's activity log.
+        for agent, other in trades:
+
+            model.activity_log.append_trade(model.schedule.time, agent.unique_id, other.unique_id, agent.wealth, other.wealth)
+
+        if timer.enabled:
+
+            for cell in cells:
+
+                for phase, seconds in cell.timings:
+
+                    timer.add(phase, seconds)
+
+            timer.add("move", moved - started)
+
+            timer.add("trade", perf_counter() - moved)
+
+        self.steps += 1
+
+        self.time += 1
+
+    def run_stage(self, cells, stage, parallel=True):
+
+        if self.pool is not None and parallel:
+
+            list(self.pool.map(stage, cells))
+
+        else:
+
+            for cell in cells:
+
+                stage(cell)
@@ -0,0 +1,505 @@
+from TradeEventSink import DEBUG, INFO
+import numpy as np
+from OrderBook import BUY, SELL
+
+# How a signal reads in the trade events.
+SIGNAL_NAMES = {BUY: "buy", SELL: "sell", None: "no"}
+
+# How far a random limit order is placed from the current price, as a fraction of it.
+QUOTE_SPREAD = 0.05
+
+# Every registered strategy by name, and by id.
+STRATEGIES = {}
+
+STRATEGY_LIST = []
+
+
+class Strategy:
+
+    """A trading strategy.
+
+    trade() runs one trade between two agent objects, drawing from rng or
+    else the agent's generator, and trade_batch() runs the trades of many
+    ArrayEngine agents at once. Register an instance with
+    register_strategy() to make it available by name to the models.
+
+    A strategy that quotes places limit orders instead when the model runs
+    an order book: quote() returns one agent's (asset name, side, price)
+    order or None, and quote_batch() returns the (agents, asset indices,
+    sides, prices) orders of many ArrayEngine agents.
+
+    A strategy that needs a market trades the market's assets, so it only
+    runs in a model that has one.
+    """
+
+    quotes = False
+
+    needs_market = False
+
+    def __init__(self, name):
+
+        self.name = name
+
+        # Set when the strategy is registered. The array engine stores it per agent.
+        self.id = None
+
+    def trade(self, agent, other, rng=None):
+
+        pass
+
+    def trade_batch(self, engine, agents, others):
+
+        pass
+
+    def quote(self, agent, rng=None):
+
+        return None
+
+    def quote_batch(self, engine, agents):
+
+        return None
+
+
+def register_strategy(strategy):
+
+    """Add a strategy to the registry under its name, and give it the next id."""
+
+    if strategy.name in STRATEGIES:
+
+        raise ValueError("A strategy is already registered as " + strategy.name)
+
+    # The array engine keeps the ids in an int8 array.
+    if len(STRATEGY_LIST) == 127:
+
+        raise ValueError("Too many strategies to register " + strategy.name)
+
+    strategy.id = len(STRATEGY_LIST)
+
+    STRATEGIES[strategy.name] = strategy
+
+    STRATEGY_LIST.append(strategy)
+
+    return strategy
+
+
+def lookup_strategy(name):
+
+    try:
+
+        return STRATEGIES[name]
+
+    except KeyError:
+
+        raise ValueError("Unknown strategy: " + str(name)) from None
+
+
+def strategy_names(strategy):
+
+    """Return the names in a strategy, which is a name or a {name: proportion} mix."""
+
+    return list(strategy) if isinstance(strategy, dict) else [strategy]
+
+
+def strategy_counts(strategy, number_of_agents):
+
+    """Split the agents over the strategies in a mix, in proportion, as (name, count) pairs."""
+
+    if not isinstance(strategy, dict):
+
+        lookup_strategy(strategy)
+
+        return [(strategy, number_of_agents)]
+
+    total = sum(strategy.values())
+
+    if total <= 0 or any(proportion < 0 for proportion in strategy.values()):
+
+        raise ValueError("Strategy proportions must be non-negative and not all zero: " + str(strategy))
+
+    shares = [(lookup_strategy(name).name, number_of_agents * proportion / total) for name, proportion in strategy.items()]
+
+    counts = [int(share) for _, share in shares]
+
+    # Hand the agents left over to the largest remainders.
+    by_remainder = sorted(range(len(shares)), key=lambda i: counts[i] - shares[i][1])
+
+    for i in by_remainder[:number_of_agents - sum(counts)]:
+
+        counts[i] += 1
+
+    return [(name, count) for (name, _), count in zip(shares, counts)]
+
+
+def assign_strategies(strategy, number_of_agents):
+
+    """Return the strategy name of every agent, with the agents of each strategy next to each other."""
+
+    return [name for name, count in strategy_counts(strategy, number_of_agents) for _ in range(count)]
+
+
+class AssetTrading(Strategy):
+
+    """Buy a random asset the other agent holds, at its current price, if the agent can pay for it."""
+
+    quotes = True
+
+    needs_market = True
+
+    def trade(self, agent, other, rng=None):
+
+        rng = agent.random if rng is None else rng
+
+        # Check if the other agent has any assets.
+        if len(other.assets) > 0:
+
+            # Choose a random asset to trade.
+            asset_to_trade = rng.choice(other.assets)
+
+            # Record the asset to trade.
+            events = agent.model.trade_events
+
+            if events.level <= DEBUG:
+
+                events.emit(DEBUG, "interest", agent.unique_id, other.unique_id, asset_to_trade.get_name())
+
+            # Get the price of the asset.
+            asset_price = asset_to_trade.get_price()
+
+            # If the agent has enough wealth to trade for the asset, trade.
+            if agent.wealth >= asset_price:
+
+                # Take the asset from the other agent.
+                agent.assets.append(asset_to_trade)
+
+                # Remove the asset from the other agent.
+                other.assets.remove(asset_to_trade)
+
+                # Give the other agent the price of the asset.
+                other.wealth += asset_price
+
+                # Take the price of the asset from the agent.
+                agent.wealth -= asset_price
+
+                # Record the trade.
+                if events.level <= INFO:
+
+                    events.emit(INFO, "asset_trade", agent.unique_id, other.unique_id, asset_to_trade.get_name(), asset_price)
+
+    def trade_batch(self, engine, agents, others):
+
+        engine.asset_trade(agents, others)
+
+    def quote(self, agent, rng=None):
+
+        """Bid for or offer a random asset at a random limit around its price."""
+
+        rng = agent.random if rng is None else rng
+
+        asset = rng.choice(agent.model.market.get_assets())
+
+        price = asset.get_price() * (1 + rng.uniform(-QUOTE_SPREAD, QUOTE_SPREAD))
+
+        # Only bid what the agent can pay for, and only offer what it holds.
+        if rng.random() < 0.5:
+
+            if agent.wealth >= price:
+
+                return asset.get_name(), BUY, price
+
+        elif asset in agent.assets:
+
+            return asset.get_name(), SELL, price
+
+        return None
+
+    def quote_batch(self, engine, agents):
+
+        return engine.random_quotes(agents, QUOTE_SPREAD)
+
+
+class WealthTrading(Strategy):
+
+    """Give a random whole amount of the agent's wealth, at most all of it, to another agent with wealth."""
+
+    def trade(self, agent, other, rng=None):
+
+        rng = agent.random if rng is None else rng
+
+        # Only whole units of wealth are traded, as wealth can be fractional after buying assets.
+        whole_wealth = int(agent.wealth)
+
+        # Check if the other agent has any wealth.
+        if other.wealth > 0 and whole_wealth >= 1:
+
+            # Choose a random amount of wealth to trade.
+            wealth_to_trade = rng.randint(1, whole_wealth)
+
+            # If the agent has enough wealth to trade, trade.
+            if agent.wealth >= wealth_to_trade:
+
+                # Give the other agent the wealth.
+                other.wealth += wealth_to_trade
+
+                # Take the wealth from the agent.
+                agent.wealth -= wealth_to_trade
+
+                # Record the trade.
+                events = agent.model.trade_events
+
+                if events.level <= INFO:
+
+                    events.emit(INFO, "wealth_trade", agent.unique_id, other.unique_id, wealth_to_trade)
+
+    def trade_batch(self, engine, agents, others):
+
+        engine.wealth_trade(agents, others)
+
+
+class SignalTrading(Strategy):
+
+    """Trade a random asset with the other agent when its indicators give a signal.
+
+    signal() reads the asset's shared Indicators and returns BUY, SELL or
+    None. On BUY the agent buys a unit from the other agent, and on SELL it
+    sells one of its own, at the current price. signals() returns the
+    signal of every market asset at once for the batch kernels.
+    """
+
+    quotes = True
+
+    needs_market = True
+
+    def signal(self, agent, asset):
+
+        return None
+
+    def signals(self, engine):
+
+        return np.zeros(len(engine.market.get_assets()), dtype=np.int8)
+
+    def trade(self, agent, other, rng=None):
+
+        rng = agent.random if rng is None else rng
+
+        # Choose a random asset to trade.
+        asset_to_trade = rng.choice(agent.model.market.get_assets())
+
+        signal = self.signal(agent, asset_to_trade)
+
+        # Record the signal the decision is based on.
+        events = agent.model.trade_events
+
+        if events.level <= DEBUG:
+
+            events.emit(DEBUG, "signal", agent.unique_id, other.unique_id, asset_to_trade.get_name(), SIGNAL_NAMES[signal])
+
+        asset_price = asset_to_trade.get_price()
+
+        # Buy from the other agent, or sell to it, if the buyer can pay and the seller holds the asset.
+        if signal == BUY:
+
+            buyer, seller = agent, other
+
+        elif signal == SELL:
+
+            buyer, seller = other, agent
+
+        else:
+
+            return
+
+        if buyer.wealth >= asset_price and asset_to_trade in seller.assets:
+
+            buyer.assets.append(asset_to_trade)
+
+            seller.assets.remove(asset_to_trade)
+
+            seller.wealth += asset_price
+
+            buyer.wealth -= asset_price
+
+            # Record the trade.
+            if events.level <= INFO:
+
+                events.emit(INFO, "asset_trade", buyer.unique_id, seller.unique_id, asset_to_trade.get_name(), asset_price)
+
+    def trade_batch(self, engine, agents, others):
+
+        engine.signal_trade(agents, others, self.signals(engine))
+
+    def quote(self, agent, rng=None):
+
+        """Bid for a random asset on a BUY signal, or offer it on a SELL signal, at the current price."""
+
+        rng = agent.random if rng is None else rng
+
+        asset = rng.choice(agent.model.market.get_assets())
+
+        signal = self.signal(agent, asset)
+
+        if signal == BUY and agent.wealth >= asset.get_price():
+
+            return asset.get_name(), BUY, asset.get_price()
+
+        if signal == SELL and asset in agent.assets:
+
+            return asset.get_name(), SELL, asset.get_price()
+
+        return None
+
+    def quote_batch(self, engine, agents):
+
+        return engine.signal_quotes(agents, self.signals(engine))
+
+
+class MeanReversion(SignalTrading):
+
+    """Buy an asset whose price is more than the agent's threshold of rolling standard deviations below its rolling mean, and sell it when above.
+
+    The z-score does not depend on the price level, so the same threshold
+    works for every asset and every price process.
+    """
+
+    def signal(self, agent, asset):
+
+        z_score = asset.indicators.z_score()
+
+        if z_score < -agent.mean_reversion_threshold:
+
+            return BUY
+
+        if z_score > agent.mean_reversion_threshold:
+
+            return SELL
+
+        return None
+
+    def signals(self, engine):
+
+        z_scores = engine.market.get_indicators("z_score")
+
+        threshold = engine.mean_reversion_threshold
+
+        return np.where(z_scores < -threshold, BUY, np.where(z_scores > threshold, SELL, 0)).astype(np.int8)
+
+
+class Momentum(SignalTrading):
+
+    """Buy an asset whose price rose by more than the strategy's threshold over the indicators' lag, and sell one that fell by more."""
+
+    def __init__(self, name, threshold=0.01):
+
+        super().__init__(name)
+
+        self.threshold = threshold
+
+    def signal(self, agent, asset):
+
+        change = asset.indicators.rate_of_change()
+
+        if change > self.threshold:
+
+            return BUY
+
+        if change < -self.threshold:
+
+            return SELL
+
+        return None
+
+    def signals(self, engine):
+
+        changes = engine.market.get_indicators("rate_of_change")
+
+        return np.where(changes > self.threshold, BUY, np.where(changes < -self.threshold, SELL, 0)).astype(np.int8)
+
+
+class GiveMoney(Strategy):
+
+    """Give one unit of wealth to the other agent."""
+
+    def trade(self, agent, other, rng=None):
+
+        other.wealth += 1
+
+        agent.wealth -= 1
+
+    def trade_batch(self, engine, agents, others):
+
+        engine.give_money(agents, others)
+
+
+class Barter(Strategy):
+
+    """Give the other agent a random whole amount of wealth, at most the other agent's own wealth."""
+
+    def trade(self, agent, other, rng=None):
+
+        rng = agent.random if rng is None else rng
+
+        # Only whole units of wealth are traded, as in the batch kernel.
+        if other.wealth >= 1:
+
+            offer = rng.randint(1, int(other.wealth))
+
+            if offer > other.wealth:
+
+                offer = other.wealth
+
+            agent.wealth -= offer
+
+            other.wealth += offer
+
+    def trade_batch(self, engine, agents, others):
+
+        engine.barter_trade(agents, others)
+
+
+class Gift(Strategy):
+
+    """Give a poorer agent a random whole amount of wealth, at most the difference between their wealth."""
+
+    def trade(self, agent, other, rng=None):
+
+        rng = agent.random if rng is None else rng
+
+        # Only whole units of wealth are given, as in the batch kernel.
+        difference = int(agent.wealth - other.wealth)
+
+        if difference >= 1:
+
+            gift = rng.randint(1, difference)
+
+            events = agent.model.trade_events
+
+            if events.level <= INFO:
+
+                events.emit(INFO, "gift", agent.unique_id, other.unique_id, gift)
+
+            agent.wealth -= gift
+
+            other.wealth += gift
+
+    def trade_batch(self, engine, agents, others):
+
+        engine.gift_trade(agents, others)
+
+
+register_strategy(AssetTrading("Asset Trading"))
+
+register_strategy(WealthTrading("Wealth Trading"))
+
+register_strategy(MeanReversion("Mean Reversion"))
+
+register_strategy(Momentum("Momentum"))
+
+# The legacy strategies that only hand over a single unit of wealth.
+register_strategy(GiveMoney("Random"))
+
+register_strategy(GiveMoney("Greedy"))
+
+register_strategy(GiveMoney("Risk Averse"))
+
+register_strategy(Barter("Barter"))
+
+register_strategy(Gift("Gift"))
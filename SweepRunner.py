@@ -0,0 +1,239 @@
+import argparse
+import csv
+import importlib
+import itertools
+import json
+import os
+from multiprocessing import Pool, cpu_count
+
+
+def build_jobs(parameters, seeds):
+
+    """Return one (params, seed) job for every combination of the parameter lists and seeds.
+
+    A key can also be a tuple of parameter names, whose list then holds tuples
+    of values that vary together, such as ("width", "height"): [(10, 10)].
+    """
+
+    names = list(parameters.keys())
+
+    jobs = []
+
+    for values in itertools.product(*(parameters[name] for name in names)):
+
+        params = {}
+
+        for name, value in zip(names, values):
+
+            if isinstance(name, tuple):
+
+                params.update(zip(name, value))
+
+            else:
+
+                params[name] = value
+
+        for seed in seeds:
+
+            jobs.append((params, seed))
+
+    return jobs
+
+
+def job_key(params, seed):
+
+    """Return a string that identifies a job in the results file."""
+
+    return json.dumps({"params": params, "seed": seed}, sort_keys=True)
+
+
+def run_job(job):
+
+    """Run one model headless and return its key and one row per step."""
+
+    model_name, params, seed, steps = job
+
+    # Import the model inside the worker, so only plain data is sent to it.
+    module_name, class_name = model_name.rsplit(".", 1)
+
+    model_class = getattr(importlib.import_module(module_name), class_name)
+
+    model = model_class(**params, seed=seed)
+
+    for _ in range(steps):
+
+        model.step()
+
+    model_vars = model.metrics.model_vars
+
+    key = job_key(params, seed)
+
+    rows = []
+
+    for step in range(steps):
+
+        row = {"job": key, **params, "seed": seed, "step": step + 1}
+
+        for name, values in model_vars.items():
+
+            row[name] = values[step]
+
+        rows.append(row)
+
+    return key, rows
+
+
+class SweepRunner:
+
+    """Runs a parameter sweep over a process pool and appends the results to a CSV file.
+
+    Every job runs one model for max_steps steps and writes one row per step,
+    with the parameters, the seed and every model reporter as columns. The
+    rows of a job are written together once it finishes, so an interrupted
+    sweep can be resumed: jobs that already have all their rows in the file
+    are skipped and rows of unfinished jobs are dropped.
+    """
+
+    def __init__(self, model_name, parameters, seeds, max_steps, output, processes=None, chunksize=None):
+
+        # The model is given as "module.Class", for example "FinancialModel.FinancialModel".
+        self.model_name = model_name
+
+        self.parameters = parameters
+
+        self.seeds = seeds
+
+        self.max_steps = max_steps
+
+        self.output = output
+
+        self.processes = processes or cpu_count()
+
+        self.chunksize = chunksize
+
+    def completed_jobs(self):
+
+        """Return the keys of the finished jobs and rewrite the file without any partial job."""
+
+        if not os.path.exists(self.output):
+
+            return set(), None
+
+        with open(self.output, newline="") as file:
+
+            reader = csv.DictReader(file)
+
+            fieldnames = reader.fieldnames
+
+            # Skip a row that was cut off when the sweep was interrupted.
+            rows = [row for row in reader if None not in row and None not in row.values()]
+
+        steps_per_job = {}
+
+        for row in rows:
+
+            steps_per_job[row["job"]] = steps_per_job.get(row["job"], 0) + 1
+
+        completed = {key for key, steps in steps_per_job.items() if steps == self.max_steps}
+
+        # Keep only the rows of the finished jobs.
+        if len(completed) * self.max_steps != len(rows):
+
+            with open(self.output, "w", newline="") as file:
+
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+
+                writer.writeheader()
+
+                writer.writerows(row for row in rows if row["job"] in completed)
+
+        return completed, fieldnames
+
+    def run(self):
+
+        """Run every job that is not in the results file yet. Returns the number of jobs run."""
+
+        completed, fieldnames = self.completed_jobs()
+
+        jobs = [(self.model_name, params, seed, self.max_steps)
+                for params, seed in build_jobs(self.parameters, self.seeds)
+                if job_key(params, seed) not in completed]
+
+        if not jobs:
+
+            return 0
+
+        # Give every worker a few chunks so that slow jobs even out.
+        chunksize = self.chunksize or max(1, len(jobs) // (self.processes * 4))
+
+        with Pool(self.processes) as pool, open(self.output, "a", newline="") as file:
+
+            writer = None if fieldnames is None else csv.DictWriter(file, fieldnames=fieldnames)
+
+            for _, rows in pool.imap_unordered(run_job, jobs, chunksize):
+
+                if writer is None:
+
+                    writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+
+                    writer.writeheader()
+
+                writer.writerows(rows)
+
+                file.flush()
+
+        return len(jobs)
+
+
+def load_results(path):
+
+    """Load a results file as a pandas DataFrame."""
+
+    import pandas as pd
+
+    return pd.read_csv(path)
+
+
+def parse_size(size):
+
+    width, height = size.lower().split("x")
+
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run a headless parameter sweep of the financial model.")
+
+    parser.add_argument("--model", default="FinancialModel.FinancialModel", help="model class as module.Class")
+
+    parser.add_argument("--agents", type=int, nargs="+", default=[100])
+
+    parser.add_argument("--strategies", nargs="+", default=["Asset Trading"])
+
+    parser.add_argument("--sizes", nargs="+", default=["10x10"], help="grid sizes as WIDTHxHEIGHT")
+
+    parser.add_argument("--engines", nargs="+", default=["agents"])
+
+    parser.add_argument("--seeds", type=int, default=1, help="number of seeds per parameter combination")
+
+    parser.add_argument("--steps", type=int, default=100)
+
+    parser.add_argument("--processes", type=int, default=None)
+
+    parser.add_argument("--output", default="sweep_results.csv")
+
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes]
+
+    parameters = {
+        "number_of_agents": args.agents,
+        "strategy": args.strategies,
+        ("width", "height"): sizes,
+        "engine": args.engines,
+    }
+
+    runner = SweepRunner(args.model, parameters, list(range(args.seeds)), args.steps, args.output, args.processes)
+
+    print("Ran " + str(runner.run()) + " jobs, results are in " + args.output + ".")
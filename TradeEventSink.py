@@ -0,0 +1,119 @@
+import sys
+from collections import deque
+
+# Event levels. A sink records the events at or above its level.
+DEBUG = 10
+INFO = 20
+OFF = 100
+
+# Message templates, filled in only when the events are written out.
+TEMPLATES = {
+    "interest": "Agent {0} is interested in trading for {2} with Agent {1}.",
+    "signal": "Agent {0} sees a {3} signal for {2} while trading with Agent {1}.",
+    "asset_trade": "Agent {0} traded {2} with Agent {1} for {3} units of wealth.",
+    "wealth_trade": "Agent {0} traded {2} units of wealth with Agent {1}.",
+    "gift": "Agent {0} gave a gift of {2} units of wealth to Agent {1}.",
+    "book_trade": "Agent {0} bought {2} from Agent {1} on the order book for {3} units of wealth.",
+}
+
+
+class TradeEventSink:
+
+    """A sink for trade events that records nothing.
+
+    The agents check `level` before building an event, so with this sink the
+    trade code does no extra work at all:
+
+        if events.level <= INFO:
+            events.emit(INFO, "wealth_trade", agent, other, amount)
+    """
+
+    def __init__(self, level=OFF):
+
+        self.level = level
+
+    def emit(self, level, kind, *fields):
+
+        pass
+
+    def flush(self):
+
+        pass
+
+    def close(self):
+
+        self.flush()
+
+    @staticmethod
+    def format(kind, fields):
+
+        return TEMPLATES[kind].format(*fields)
+
+
+class MemoryTradeEventSink(TradeEventSink):
+
+    """Keeps the latest events in an in-memory ring."""
+
+    def __init__(self, capacity=10000, level=INFO):
+
+        super().__init__(level)
+
+        self.events = deque(maxlen=capacity)
+
+    def emit(self, level, kind, *fields):
+
+        if level >= self.level:
+
+            self.events.append((level, kind, fields))
+
+    def lines(self):
+
+        return [self.format(kind, fields) for _, kind, fields in self.events]
+
+
+class FileTradeEventSink(TradeEventSink):
+
+    """Writes events to a file or stream in batches."""
+
+    def __init__(self, file=sys.stdout, level=INFO, batch_size=4096):
+
+        super().__init__(level)
+
+        # Open the file if given a path, otherwise write to the stream as it is.
+        self.owns_file = isinstance(file, str)
+
+        self.file = open(file, "a") if self.owns_file else file
+
+        self.batch_size = batch_size
+
+        self.buffer = []
+
+    def emit(self, level, kind, *fields):
+
+        if level >= self.level:
+
+            self.buffer.append((kind, fields))
+
+            if len(self.buffer) >= self.batch_size:
+
+                self.flush()
+
+    def flush(self):
+
+        """Format the buffered events and write them in a single call."""
+
+        if self.buffer:
+
+            self.file.write("".join(self.format(kind, fields) + "\n" for kind, fields in self.buffer))
+
+            self.buffer = []
+
+        self.file.flush()
+
+    def close(self):
+
+        self.flush()
+
+        if self.owns_file:
+
+            self.file.close()
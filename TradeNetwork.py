@@ -0,0 +1,180 @@
+import numpy as np
+
+
+class TradeNetwork:
+
+    """An undirected graph of who can trade with whom, in CSR form.
+
+    The neighbours of node i are indices[indptr[i]:indptr[i + 1]], sorted, so
+    the graph takes one int64 per node and one int32 per edge end, and a
+    uniformly random neighbour is a single index into that slice. The nodes
+    are the agents' unique ids.
+    """
+
+    def __init__(self, indptr, indices):
+
+        self.indptr = indptr
+
+        self.indices = indices
+
+        self.degree = np.diff(indptr)
+
+    @classmethod
+    def from_edges(cls, number_of_nodes, sources, targets):
+
+        """Build the graph from edge lists, dropping self-loops and duplicate edges."""
+
+        sources = np.asarray(sources, dtype=np.int64)
+
+        targets = np.asarray(targets, dtype=np.int64)
+
+        keep = sources != targets
+
+        sources, targets = sources[keep], targets[keep]
+
+        # Both directions of every edge, sorted by source and then target, without repeats.
+        keys = np.concatenate([sources * number_of_nodes + targets, targets * number_of_nodes + sources])
+
+        keys.sort()
+
+        first = np.ones(len(keys), dtype=bool)
+
+        first[1:] = keys[1:] != keys[:-1]
+
+        keys = keys[first]
+
+        indptr = np.zeros(number_of_nodes + 1, dtype=np.int64)
+
+        indptr[1:] = np.cumsum(np.bincount(keys // number_of_nodes, minlength=number_of_nodes))
+
+        return cls(indptr, (keys % number_of_nodes).astype(np.int32))
+
+    def number_of_nodes(self):
+
+        return len(self.indptr) - 1
+
+    def number_of_edges(self):
+
+        return len(self.indices) // 2
+
+    def neighbours(self, node):
+
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def random_neighbour(self, node, random):
+
+        """Return a uniformly chosen neighbour of node, drawing from a random.Random, or None if it has none."""
+
+        degree = int(self.degree[node])
+
+        if degree == 0:
+
+            return None
+
+        return int(self.indices[self.indptr[node] + random.randrange(degree)])
+
+    def random_neighbours(self, nodes, rng):
+
+        """Return a uniformly chosen neighbour of every node, which must all have one, drawing from a NumPy Generator."""
+
+        offsets = (rng.random(len(nodes)) * self.degree[nodes]).astype(np.int64)
+
+        return self.indices[self.indptr[nodes] + offsets].astype(np.int64)
+
+
+def lattice(number_of_nodes, rng=None, k=4):
+
+    """A ring where every node is linked to its k nearest nodes, k / 2 on each side."""
+
+    sources = np.repeat(np.arange(number_of_nodes), k // 2)
+
+    targets = (sources + np.tile(np.arange(1, k // 2 + 1), number_of_nodes)) % number_of_nodes
+
+    return TradeNetwork.from_edges(number_of_nodes, sources, targets)
+
+
+def small_world(number_of_nodes, rng, k=4, p=0.1):
+
+    """A ring lattice with every edge rewired to a random node with probability p (Watts-Strogatz)."""
+
+    sources = np.repeat(np.arange(number_of_nodes), k // 2)
+
+    targets = (sources + np.tile(np.arange(1, k // 2 + 1), number_of_nodes)) % number_of_nodes
+
+    rewired = rng.random(len(targets)) < p
+
+    targets[rewired] = rng.integers(0, number_of_nodes, np.count_nonzero(rewired))
+
+    return TradeNetwork.from_edges(number_of_nodes, sources, targets)
+
+
+def scale_free(number_of_nodes, rng, m=2):
+
+    """A graph grown by preferential attachment, every new node linking to m existing ones (Barabasi-Albert).
+
+    Picking a uniformly random entry of the list of edge ends picks a node
+    in proportion to its degree. A node that picks the same target twice
+    gets a single edge to it.
+    """
+
+    m = min(m, number_of_nodes - 1)
+
+    if m < 1:
+
+        return TradeNetwork.from_edges(number_of_nodes, [], [])
+
+    # Start from a complete graph of m + 1 nodes.
+    sources = [i for i in range(m + 1) for j in range(i + 1, m + 1)]
+
+    targets = [j for i in range(m + 1) for j in range(i + 1, m + 1)]
+
+    ends = sources + targets
+
+    draws = rng.random((max(number_of_nodes - m - 1, 0), m)).tolist()
+
+    for node, row in enumerate(draws, start=m + 1):
+
+        size = len(ends)
+
+        picks = [ends[int(draw * size)] for draw in row]
+
+        sources.extend([node] * m)
+
+        targets.extend(picks)
+
+        ends.extend(picks)
+
+        ends.extend([node] * m)
+
+    return TradeNetwork.from_edges(number_of_nodes, sources, targets)
+
+
+# Every topology by name. "grid" trades with cellmates and needs no network.
+TOPOLOGIES = {
+    "lattice": lattice,
+    "small_world": small_world,
+    "scale_free": scale_free,
+}
+
+
+def make_network(topology, number_of_nodes, seed=None):
+
+    """Return the trade network of a topology name, None for "grid", or the network itself if given one."""
+
+    if topology is None or isinstance(topology, TradeNetwork):
+
+        return topology
+
+    if topology == "grid":
+
+        return None
+
+    try:
+
+        generate = TOPOLOGIES[topology]
+
+    except KeyError:
+
+        raise ValueError("Unknown topology: " + str(topology)) from None
+
+    return generate(number_of_nodes, np.random.default_rng(seed))
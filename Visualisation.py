@@ -1,8 +1,16 @@
-from mesa.visualization.modules import CanvasGrid, ChartModule, TextElement
+from mesa.visualization.modules import CanvasGrid, TextElement
 from mesa.visualization.modules import BarChartModule, PieChartModule
 from mesa.visualization.ModularVisualization import ModularServer, VisualizationElement
 from mesa.visualization.UserParam import UserSettableParameter
 from FinancialModel import FinancialModel
+from EnsembleModel import EnsembleModel
+from ReplayModel import ReplayModel
+from RunRecorder import Replay
+from IncrementalCanvasGrid import IncrementalCanvasGrid
+from BatchedChartModule import BatchedChartModule
+from BackgroundServer import BackgroundServer
+import math
+import sys
 
 class CustomCSS(VisualizationElement):
     package_includes = ["my_style.css"]
@@ -33,20 +41,101 @@ simulation_params = {
         description="Choose the trading strategy for the agents.",
     ),
 
+    "topology": UserSettableParameter(
+        "choice",
+        "Topology",
+        value="grid", # default
+        choices=["grid", "lattice", "small_world", "scale_free"],
+        description="Trade with agents in the same cell, or with neighbours in a generated network.",
+    ),
+
+    "log_trades": UserSettableParameter(
+        "checkbox",
+        "Log trades",
+        value=False,
+        description="Print every trade event to the console.",
+    ),
+
+    "time_phases": UserSettableParameter(
+        "checkbox",
+        "Time phases",
+        value=False,
+        description="Measure how long each phase of a step takes.",
+    ),
+
     "width": NUMBER_OF_CELLS,
 
     "height": NUMBER_OF_CELLS,
 }
 
-def wealth_to_radius(wealth):
+ensemble_params = {
+    "number_of_agents": UserSettableParameter(
+        "slider",
+        "Number of agents per replica",
+        50, # default
+        1, # min
+        NUMBER_OF_CELLS * NUMBER_OF_CELLS, # max
+        1, # step
+        description="Choose how many agents every replica has.",
+    ),
+
+    "replicas": UserSettableParameter(
+        "slider",
+        "Number of replicas",
+        100, # default
+        10, # min
+        1000, # max
+        10, # step
+        description="Choose how many independent runs to simulate together.",
+    ),
+
+    "strategy": simulation_params["strategy"],
+
+    "topology": simulation_params["topology"],
+
+    "width": NUMBER_OF_CELLS,
+
+    "height": NUMBER_OF_CELLS,
+}
+
+def wealth_to_radius(wealth, scale=0.1):
 
     """Maps the agent's wealth to a radius size."""
-    return 0.25 + wealth * 0.1  # add 0.1 to make sure the minimum radius is 0.5
+    return 0.25 + wealth * scale  # add 0.1 to make sure the minimum radius is 0.5
+
+def wealth_scale(model):
+
+    """Returns the radius per unit of wealth for the current step.
+
+    It is 0.1 until the wealthiest agent would outgrow its cell, and then halves
+    every time the highest wealth doubles, so most steps keep the same scale.
+    """
+
+    # The collector has already found the highest wealth for the current step.
+    highest = model.metrics.current_summary(model)["wealthiest"]
+
+    if highest <= 2.5:
+
+        return 0.1
+
+    return 0.1 / 2 ** math.ceil(math.log2(highest / 2.5))
+
+def portrayal_key(agent):
+
+    """Returns what the agent's portrayal depends on, to re-portray it only when this changes."""
+
+    model = agent.model
+
+    wealthiest = agent.unique_id == model.metrics.current_summary(model)["wealthiest_id"] and model.schedule.time > 10
+
+    return agent.pos, agent.wealth, wealthiest
 
 def agent_portrayal(agent):
     """Returns the portrayal of the given agent."""
 
-    radius = wealth_to_radius(agent.wealth)
+    model = agent.model
+
+    radius = wealth_to_radius(agent.wealth, wealth_scale(model))
 
     portrayal = {
         "Shape": "circle",
@@ -61,8 +150,8 @@ def agent_portrayal(agent):
     #Determine the agent's color based on its wealth
     if agent.wealth > 0:
 
-        # Highlight the wealthiest agent after 10 steps
-        if agent.wealth == agent.model.get_wealthiest_agent() and agent.model.schedule.time > 10:
+        # Highlight the wealthiest agent after 10 steps, as found once per step by the collector
+        if agent.unique_id == model.metrics.current_summary(model)["wealthiest_id"] and model.schedule.time > 10:
 
             portrayal["Color"] = "gold"
             portrayal["Layer"] = 2
@@ -90,7 +179,7 @@ chart_currents = PieChartModule(
 
 )
 
-wealthiest_agent = ChartModule(
+wealthiest_agent = BatchedChartModule(
     [
         {"Label": "Wealthiest Agent", "Color": "Purple"},
     ],
@@ -99,7 +188,7 @@ wealthiest_agent = ChartModule(
 
 )
 
-gini = ChartModule(
+gini = BatchedChartModule(
     [
         {"Label": "Gini", "Color": "Blue"},
     ],
@@ -107,13 +196,83 @@ gini = ChartModule(
     data_collector_name="datacollector_gini"
 )
 
-# create the grid with the initial values
-grid = CanvasGrid(agent_portrayal, 10, 10, 500, 500)
+timings = BatchedChartModule(
+    [
+        {"Label": "Step Time (ms)", "Color": "Black"},
+        {"Label": "Move Time (ms)", "Color": "Orange"},
+        {"Label": "Trade Time (ms)", "Color": "Teal"},
+        {"Label": "Collect Time (ms)", "Color": "Gray"},
+    ],
+
+    data_collector_name="datacollector_timings"
+)
+
+def band_chart(metric, color, data_collector_name):
+
+    """Returns a chart of a metric's mean over the replicas, inside the band from its 5th to its 95th percentile."""
+
+    return BatchedChartModule(
+        [
+            {"Label": metric + " P5", "Color": color},
+            {"Label": metric + " P95", "Color": color, "Fill": "-1"},
+            {"Label": metric + " Mean", "Color": color},
+        ],
+
+        data_collector_name=data_collector_name,
+    )
+
+# create the grid with the initial values, sending only the agents that changed every frame
+grid = IncrementalCanvasGrid(agent_portrayal, 10, 10, 500, 500, agent_key=portrayal_key, frame_key=wealth_scale)
+
+# Step the model in the background as fast as it can with "--background", and only render the latest step.
+server_class = BackgroundServer if "--background" in sys.argv else ModularServer
+
+# Play back a recorded run with "python Visualisation.py --replay run.npz" instead of simulating one.
+if len(sys.argv) > 2 and sys.argv[1] == "--replay":
+
+    replay = Replay(sys.argv[2])
+
+    replay_params = {
+        "path": sys.argv[2],
+
+        "start_step": UserSettableParameter(
+            "slider",
+            "Start at step",
+            0, # default
+            0, # min
+            replay.steps, # max
+            1, # step
+            description="Choose the recorded step to start playing back from.",
+        ),
+    }
+
+    replay_grid = IncrementalCanvasGrid(agent_portrayal, replay.meta["width"], replay.meta["height"], 500, 500,
+                                        agent_key=portrayal_key, frame_key=wealth_scale)
+
+    server = server_class(ReplayModel,
+                        [replay_grid, wealthiest_agent, gini, chart_currents, CustomCSS()],
+                        "Financial Model Replay",
+                        replay_params,
+                        8523)
+
+# Run a Monte Carlo ensemble of replicas with "--ensemble", and chart the spread of its outcomes.
+elif "--ensemble" in sys.argv:
+
+    server = server_class(EnsembleModel,
+                        [band_chart("Gini", "#0000ff", "datacollector_gini"),
+                         band_chart("Wealthiest Agent", "#800080", "datacollector_wealthiest_agent"),
+                         band_chart("Wealthy Agents", "#008000", "datacollector_currents"),
+                         CustomCSS()],
+                        "Financial Model Ensemble",
+                        ensemble_params,
+                        8523)
+
+else:
 
-server = ModularServer(FinancialModel, 
-                    [grid, wealthiest_agent, gini, chart_currents, CustomCSS()],
-                    "Financial Model", 
-                    simulation_params,
-                    8523)
+    server = server_class(FinancialModel, 
+                        [grid, wealthiest_agent, gini, timings, chart_currents, CustomCSS()],
+                        "Financial Model", 
+                        simulation_params,
+                        8523)
 
 server.launch()
@@ -1,13 +1,38 @@
 from mesa import Agent
+from Strategies import STRATEGIES, lookup_strategy
 
 class FinancialAgent(Agent):
     """ An agent with fixed initial wealth."""
 
-    def __init__(self, unique_id, model, wealth, risk_aversion):
+    def __init__(self, unique_id, model, wealth, risk_aversion, strategy=None):
         super().__init__(unique_id, model)
         self.wealth = wealth
         self.risk_aversion = risk_aversion
         self.transactions = 0
+        # Follow the model's strategy unless the agent is given its own
+        self.strategy = model.strategy if strategy is None else strategy
+
+    @property
+    def strategy(self):
+        return self._strategy
+
+    @strategy.setter
+    def strategy(self, strategy):
+        # Look the strategy up once, so trading needs no dispatch on its name
+        self.trade_strategy = lookup_strategy(strategy)
+        self._strategy = strategy
+
+    @property
+    def wealth(self):
+        return self._wealth
+
+    @wealth.setter
+    def wealth(self, wealth):
+        # Keep the model's Gini tracker up to date
+        gini_tracker = getattr(self.model, "gini_tracker", None)
+        if gini_tracker is not None and hasattr(self, "_wealth"):
+            gini_tracker.update(self._wealth, wealth)
+        self._wealth = wealth
     
     def step(self):
         self.move()
@@ -15,21 +40,13 @@ class FinancialAgent(Agent):
             self.trade()
 
     def trade(self):
-        cellmates = self.model.grid.get_cell_list_contents([self.pos])
-        if len(cellmates) > 1:
-            other = self.random.choice(cellmates)
-            if self.get_strategy() == "Barter":
-                self.barter_trade(other)
-            elif self.get_strategy() == "Gift":
-                self.gift_trade(other)
-            else:
-                self.give_money(other)
-            
+        other = self.model.choose_partner(self)
+        if other is not None:
+            self.trade_strategy.trade(self, other)
             self.transactions += 1
         
     def give_money(self, other):
-        other.wealth += 1
-        self.wealth -= 1
+        STRATEGIES["Random"].trade(self, other)
     
     def move(self):
         possible_steps = self.model.grid.get_neighborhood(
@@ -41,19 +58,10 @@ class FinancialAgent(Agent):
         self.model.grid.move_agent(self, new_position)
 
     def barter_trade(self, other):
-        if other.wealth > 0:
-            offer = self.random.randint(1, other.wealth)
-            if offer > other.wealth:
-                offer = other.wealth
-            self.wealth -= offer
-            other.wealth += offer
+        STRATEGIES["Barter"].trade(self, other)
 
     def gift_trade(self, other):
-        if other.wealth < self.wealth:
-            gift = self.random.randint(1, self.wealth - other.wealth)
-            print("Gift: ", gift)
-            self.wealth -= gift
-            other.wealth += gift
+        STRATEGIES["Gift"].trade(self, other)
     
     def momentum_trade(self):
         if self.wealth <= 0:
@@ -81,4 +89,4 @@ class FinancialAgent(Agent):
         return self.transactions
 
     def get_strategy(self):
-        return self.model.strategy
+        return self.strategy
@@ -2,74 +2,122 @@ from mesa import Model
 from agent import FinancialAgent
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
+from MetricsCollector import MetricsCollector, SummaryReporter
+from ArrayEngine import ArrayEngine
+from GiniTracker import GiniTracker
+from GridPlacement import place_agents
+from TradeEventSink import TradeEventSink, FileTradeEventSink
+from Strategies import assign_strategies, strategy_names, lookup_strategy
+from TradeNetwork import make_network
+from CellIndex import choose_cellmate
 
 class FinancialModel(Model):
     """A model with some number of agents."""
-    def __init__(self, number_of_agents, width, height, strategy):
+    def __init__(self, number_of_agents, width, height, strategy, engine="agents", log_trades=False, seed=None, topology="grid"):
+        # Mesa's Model.__new__ has already used the seed to seed self.random
+        self.seed = seed
+        # This model has no market, so its agents hold no assets to trade
+        for name in strategy_names(strategy):
+            if lookup_strategy(name).needs_market:
+                raise ValueError("The strategy " + name + " needs a market; use FinancialModel.FinancialModel instead")
         self.num_agents = number_of_agents
         self.grid = MultiGrid(width, height, True)
+        # A strategy name, or a {name: proportion} mix of strategies
         self.strategy = strategy
+        self.engine = engine
+        self.array_engine = None
+        self.gini_tracker = None
+        # Print the trade events when asked to, otherwise record nothing
+        self.trade_events = FileTradeEventSink() if log_trades else TradeEventSink()
         self.schedule = RandomActivation(self)
         self.running = True
         self.wealthiest_agent = 0
+        # Trade with cellmates on the grid, or with neighbours in a generated trade network
+        self.topology = topology
+        self.network = make_network(topology, self.num_agents, seed=self.random.getrandbits(64)) if topology != "grid" else None
 
         # Create agents
-        for i in range(self.num_agents):
-            a = FinancialAgent(i, self, 1, 0.5)
-            self.schedule.add(a)
-            
-            # Add the agent to a random grid cell
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(a, (x, y))
-
-        self.datacollector_currents = DataCollector(
-            {
-                "Wealthy Agents": self.current_wealthy_agents,
-                "Non Wealthy Agents": self.current_non_wealthy_agents,
-            }
-        )
+        if self.engine == "array":
+            # Keep the agents in NumPy arrays instead of agent objects
+            self.array_engine = ArrayEngine(
+                self.num_agents, width, height, strategy,
+                unique_cells=False, seed=self.random.getrandbits(64), network=self.network
+            )
+        else:
+            strategies = assign_strategies(strategy, self.num_agents)
+            agents = [FinancialAgent(i, self, 1, 0.5, strategies[i]) for i in range(self.num_agents)]
+            for a in agents:
+                self.schedule.add(a)
 
-        self.datacollector_gini  = DataCollector(
-            model_reporters={"Gini": self.compute_gini},
-            agent_reporters={"Wealth": "wealth"}
-        )
+            # Add every agent to a random grid cell
+            cells = [(self.random.randrange(self.grid.width), self.random.randrange(self.grid.height)) for _ in agents]
+            place_agents(self.grid, agents, cells)
+            # The agents by unique id, which is their node in the trade network
+            self.agents_by_id = agents
 
-        self.datacollector_transactions = DataCollector(
-            model_reporters={"Transactions": self.transactions}
-        )
+            # Track the Gini coefficient as the agents trade
+            self.gini_tracker = GiniTracker(agent.wealth for agent in self.schedule.agents)
 
-        self.datacollector_wealthiest_agent = DataCollector(
-            model_reporters={"Wealthiest Agent": self.get_wealthiest_agent}
+        # A single collector computes every metric in one pass over the agents,
+        # and the charts look it up under the old collector names
+        self.metrics = MetricsCollector(
+            model_reporters={
+                "Wealthy Agents": SummaryReporter("wealthy"),
+                "Non Wealthy Agents": SummaryReporter("non_wealthy"),
+                "Gini": self.compute_gini,
+                "Transactions": SummaryReporter("transactions"),
+                "Wealthiest Agent": SummaryReporter("wealthiest"),
+            },
+            agent_reporters={"Wealth": "wealth"}
         )
-
+        self.datacollector_currents = self.metrics
+        self.datacollector_gini = self.metrics
+        self.datacollector_transactions = self.metrics
+        self.datacollector_wealthiest_agent = self.metrics
 
     def step(self):
         '''Advance the model by one step.'''
+        if self.array_engine is not None:
+            self.array_engine.step()
         self.schedule.step()
-        self.datacollector_currents.collect(self)
-        self.datacollector_gini.collect(self)
-        self.datacollector_transactions.collect(self)
-        self.datacollector_wealthiest_agent.collect(self)
+        self.metrics.collect(self)
+        self.trade_events.flush()
+
+    def choose_partner(self, agent):
+        '''Return a random cellmate or network neighbour of the agent, or None if it has none.'''
+        if self.network is None:
+            return choose_cellmate(self.grid, agent, agent.random)
+        neighbour = self.network.random_neighbour(agent.unique_id, agent.random)
+        return None if neighbour is None else self.agents_by_id[neighbour]
+
+    def set_trade_events(self, trade_events):
+        '''Replace the trade event sink, for example to switch logging on or off.'''
+        self.trade_events.close()
+        self.trade_events = trade_events
         
     def compute_gini(model):
-        agent_wealths = [agent.wealth for agent in model.schedule.agents]
-        x = sorted(agent_wealths)
-        N = model.num_agents
-        B = sum(xi * (N - i) for i, xi in enumerate(x)) / (N * sum(x))
-        return (1 + (1 / N) - 2 * B)
+        if model.array_engine is not None:
+            return model.array_engine.compute_gini()
+        return model.gini_tracker.gini()
     
     def get_wealthiest_agent(self):
+        if self.array_engine is not None:
+            return self.array_engine.get_wealthiest_agent()
         return max([agent.wealth for agent in self.schedule.agents])
             
     @staticmethod
     def current_wealthy_agents(model) -> int:
+        if model.array_engine is not None:
+            return model.array_engine.current_wealthy_agents()
         return sum([1 for agent in model.schedule.agents if agent.wealth > 0])
 
     @staticmethod
     def current_non_wealthy_agents(model) -> int:
+        if model.array_engine is not None:
+            return model.array_engine.current_non_wealthy_agents()
         return sum([1 for agent in model.schedule.agents if agent.wealth <= 0])
     
     def transactions(self):
+        if self.array_engine is not None:
+            return self.array_engine.total_transactions()
         return sum([agent.transactions for agent in self.schedule.agents])
\ No newline at end of file
@@ -1,9 +1,11 @@
-from mesa.visualization.modules import CanvasGrid
 from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.UserParam import UserSettableParameter
 
 from model import FinancialModel
-from mesa.visualization.modules import ChartModule
+from HeatmapModule import HeatmapModule
+from BatchedChartModule import BatchedChartModule
+from BackgroundServer import BackgroundServer
+import sys
 
 NUMBER_OF_CELLS = 100
 
@@ -16,8 +18,8 @@ simulation_params = {
         "Number of agents", 
         100, # default
         10, # min
-        200, # max
-        1, # step
+        100000, # max
+        10, # step
         description="Choose how many agents to include in the simulation.",
     ),
 
@@ -29,25 +31,37 @@ simulation_params = {
         description="Choose the trading strategy for the agents.",
     ),
 
+    "engine": UserSettableParameter(
+        "choice",
+        "Engine",
+        value="agents", # default
+        choices=["agents", "array"],
+        description="Simulate agent objects, or NumPy arrays for large populations.",
+    ),
+
+    "topology": UserSettableParameter(
+        "choice",
+        "Topology",
+        value="grid", # default
+        choices=["grid", "lattice", "small_world", "scale_free"],
+        description="Trade with agents in the same cell, or with neighbours in a generated network.",
+    ),
+
+    "log_trades": UserSettableParameter(
+        "checkbox",
+        "Log trades",
+        value=False,
+        description="Print every trade event to the console.",
+    ),
+
     "width": NUMBER_OF_CELLS,
     "height": NUMBER_OF_CELLS,
 }
 
-def agent_portrayal(agent):
-    portrayal = {"Shape": "circle", "Filled": "true", "r": 0.5}
-    
-    if agent.wealth > 0:
-        portrayal["Color"] = "green"
-        portrayal["Layer"] = 0
-    else:
-        portrayal["Color"] = "red"
-        portrayal["Layer"] = 1
-        portrayal["r"] = 0.2
-    return portrayal
-
-grid = CanvasGrid(agent_portrayal, NUMBER_OF_CELLS, NUMBER_OF_CELLS, SIZE_OF_CANVAS_IN_PIXELS_X, SIZE_OF_CANVAS_IN_PIXELS_Y)
-
-chart_currents = ChartModule(
+# Draw tiles of agent density and mean wealth, so the frame size does not grow with the population.
+grid = HeatmapModule(NUMBER_OF_CELLS, NUMBER_OF_CELLS, 1, SIZE_OF_CANVAS_IN_PIXELS_X, SIZE_OF_CANVAS_IN_PIXELS_Y)
+
+chart_currents = BatchedChartModule(
     [
         {"Label": "Wealthy Agents", "Color": "Green"},
         {"Label": "Non Wealthy Agents", "Color": "Red"},
@@ -56,27 +70,30 @@ chart_currents = ChartModule(
     data_collector_name="datacollector_currents"
 )
 
-gini = ChartModule(
+gini = BatchedChartModule(
     [
         {"Label": "Gini", "Color": "Blue"},
     ],
     data_collector_name="datacollector_gini"
 )
 
-transactions = ChartModule(
+transactions = BatchedChartModule(
     [
         {"Label": "Transactions", "Color": "Black"},
     ],
     data_collector_name="datacollector_transactions"
 )
 
-wealthiest_agent = ChartModule(
+wealthiest_agent = BatchedChartModule(
     [
         {"Label": "Wealthiest Agent", "Color": "Purple"},
     ],
     data_collector_name="datacollector_wealthiest_agent"
 )
 
-server = ModularServer(FinancialModel, [grid, chart_currents, gini, transactions, wealthiest_agent], "Money Model", simulation_params)
+# Step the model in the background as fast as it can with "--background", and only render the latest step.
+server_class = BackgroundServer if "--background" in sys.argv else ModularServer
+
+server = server_class(FinancialModel, [grid, chart_currents, gini, transactions, wealthiest_agent], "Money Model", simulation_params)
 server.port = 8521 # The default
 server.launch()
\ No newline at end of file
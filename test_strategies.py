@@ -0,0 +1,17 @@
+from FinancialModel import FinancialModel
+
+
+def test_mean_reversion_trades_under_every_price_process():
+
+    for process in ("gbm", "ou", "jump"):
+
+        for engine in ("agents", "array"):
+
+            model = FinancialModel(60, 10, 10, "Mean Reversion", seed=1, price_process=process, engine=engine)
+
+            for _ in range(30):
+
+                model.step()
+
+            # Every agent starts with a wealth of 1, so a sale leaves a wealthier seller.
+            assert model.get_wealthiest_agent() > 1, (process, engine)
@@ -0,0 +1,36 @@
+import io
+from FinancialModel import FinancialModel
+from TradeEventSink import FileTradeEventSink, DEBUG
+
+
+def run_logged(steps=10, **kwargs):
+
+    """Step a model with every trade event written out, and return the log."""
+
+    model = FinancialModel(60, 10, 10, seed=1, **kwargs)
+
+    log = io.StringIO()
+
+    model.set_trade_events(FileTradeEventSink(log, level=DEBUG))
+
+    for _ in range(steps):
+
+        model.step()
+
+    return log.getvalue()
+
+
+def test_order_book_trades_are_logged():
+
+    log = run_logged(strategy="Asset Trading", order_book=True)
+
+    assert "on the order book" in log
+
+
+def test_signal_strategies_are_logged():
+
+    for strategy in ("Momentum", "Mean Reversion"):
+
+        log = run_logged(strategy=strategy, price_process="gbm")
+
+        assert " signal for " in log